@@ -11,7 +11,7 @@ from services.agent_service import AgentService
 
 @router.get("/", response_model=List[Agent])
 async def get_all_agents(db: Session = Depends(get_session)):
-    return await AgentService.fecth_and_update_agents(db)
+    return await AgentService.fetch_and_update_agents(db)
 
 # done with the update part in CRUD, now we go to the delete part
 
@@ -1,18 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
-from sqlmodel import Session
-from core.database import get_session
-from services.ai_service import generate_coaching_report_stream
+from sqlmodel.ext.asyncio.session import AsyncSession
+from core.config import settings
+from core.database import async_engine
+from core.sse import SSE_HEADERS, sse_stream
+from services.ai_service import detect_weaknesses, generate_coaching_report_stream, get_latest_match_id
+from services.report_cache import get_cached_report, replay_report, report_fingerprint, store_report
+from services.report_flights import join_report
 
 router = APIRouter()
 
 
 @router.get("/report/{puuid}", response_class=StreamingResponse)
-async def get_coaching_report(puuid: str, db: Session = Depends(get_session)):
+async def get_coaching_report(
+    request: Request,
+    puuid: str,
+    limit: int | None = Query(None, ge=3, le=settings.ANALYSIS_MAX_MATCHES),
+    since: datetime | None = None,
+    until: datetime | None = None,
+    season: str | None = None,
+    tier: str | None = None,
+):
     """
-    Stream a personalized coaching report for the given player.
+    Stream a personalized coaching report for the given player as Server-Sent Events.
+    Optional window: last `limit` matches, `since`/`until` dates, or an act (`season`, e.g. "e9a3").
+    `tier` picks the model from LLM_TIER_MODELS (defaults to LLM_DEFAULT_TIER).
     """
-    return StreamingResponse(
-        generate_coaching_report_stream(puuid, db),
-        media_type="text/event-stream"
-    )
+    tier = tier or settings.LLM_DEFAULT_TIER
+    if tier not in settings.LLM_TIER_MODELS:
+        raise HTTPException(status_code=422, detail=f"Unknown tier, expected one of {sorted(settings.LLM_TIER_MODELS)}")
+
+    # The session only lives for the analysis; it is back in the pool before
+    # the (multi-second) generation starts.
+    async with AsyncSession(async_engine, expire_on_commit=False) as db:
+        data = await detect_weaknesses(puuid, db, limit=limit, since=since, until=until, season=season)
+        latest_match_id = None if "error" in data else await get_latest_match_id(puuid, db)
+
+    if "error" in data:
+        chunks = generate_coaching_report_stream(data, tier=tier)
+    else:
+        # Same newest match + same weaknesses => same report; replay it
+        window_key = f"limit={limit}&since={since}&until={until}&season={season}&tier={tier}"
+        fingerprint = report_fingerprint(latest_match_id, data["weaknesses"], window_key)
+
+        cached = await get_cached_report(puuid, window_key, fingerprint)
+        if cached is not None:
+            chunks = replay_report(cached)
+        else:
+            # Identical concurrent requests share one generation
+            chunks = join_report(
+                (puuid, window_key, fingerprint),
+                lambda: generate_coaching_report_stream(
+                    data,
+                    on_complete=lambda text: store_report(puuid, window_key, fingerprint, text),
+                    tier=tier,
+                ),
+            )
+
+    return StreamingResponse(sse_stream(chunks, request), media_type="text/event-stream", headers=SSE_HEADERS)
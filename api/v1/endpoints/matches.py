@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlmodel import Session, select, delete, desc
 from typing import List
 
-from core.database import get_session  # Import hàm yield session xịn xò
+from sqlmodel.ext.asyncio.session import AsyncSession
+from core.database import async_engine, get_session, get_async_session  # Import hàm yield session xịn xò
 from models.match import Match, MatchParticipation  # Import Model
 from models.user import User
+from models.player_stats import PlayerStats
 from services.match_service import MatchService
 from schemas.match_schema import ParticipationBase, MatchScoreboard
 from core.limiter import limiter
@@ -21,83 +23,92 @@ async def demo(region: str, puuid: str):
 
 
 @router.get("/demo2/{puuid}", response_model=List[ParticipationBase])
-async def demo2(puuid: str, db: Session = Depends(get_session)):
+async def demo2(puuid: str, db: AsyncSession = Depends(get_async_session)):
 
     statement = (
         select(MatchParticipation)
         .where(MatchParticipation.puuid == puuid)
         .order_by(desc(MatchParticipation.start_time))
     )
-    matches = db.exec(statement).all()
+    matches = (await db.exec(statement)).all()
     return matches
 
 
-import json
-import redis
-import ssl
 from celery.result import AsyncResult
+from pydantic import TypeAdapter
 from core.config import settings
+from core.redis import get_redis
+from core.response_cache import ResponseCache, json_response
+from services.match_history import build_history, history_cache_key
 from worker import celery_app, fetch_matches_task
 
-# Initialize Redis connection for caching
-_redis_url = settings.REDIS_URL.replace("?ssl_cert_reqs=CERT_NONE", "")
-if "rediss://" in _redis_url:
-    redis_client = redis.Redis.from_url(_redis_url, decode_responses=True, ssl_cert_reqs=ssl.CERT_NONE)
-else:
-    redis_client = redis.Redis.from_url(_redis_url, decode_responses=True)
+# Serialized match histories: in-process LRU in front of async Redis
+matches_cache = ResponseCache(
+    lru_size=settings.MATCHES_CACHE_LRU_SIZE,
+    local_ttl=settings.MATCHES_CACHE_LOCAL_TTL,
+    redis_ttl=settings.MATCHES_CACHE_TTL,
+    stale_ttl=settings.MATCHES_CACHE_STALE_TTL,
+    lock_ms=settings.MATCHES_CACHE_LOCK_MS,
+    miss_ttl=settings.MATCHES_CACHE_MISS_TTL,
+)
+
+# Finished matches never change: scoreboards are built once, kept forever in
+# Redis; the in-process copies expire so other workers see a /refresh
+scoreboard_cache = ResponseCache(
+    lru_size=settings.SCOREBOARD_CACHE_LRU_SIZE,
+    local_ttl=settings.SCOREBOARD_CACHE_LOCAL_TTL,
+    redis_ttl=None,
+)
+_scoreboard = TypeAdapter(MatchScoreboard)
+# Bump whenever MatchScoreboard/ParticipationBase serialize differently:
+# cached entries never expire, so old bytes would otherwise live forever
+SCOREBOARD_VERSION = 1
+IMMUTABLE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+
+def scoreboard_cache_key(match_id: str) -> str:
+    return f"scoreboard:v{SCOREBOARD_VERSION}:{match_id}"
+
+
+async def _build_scoreboard(match_id: str) -> bytes | None:
+    async with AsyncSession(async_engine) as db:
+        match = await MatchService().get_match_detail(match_id, db)
+        if match is None:
+            return None
+        return _scoreboard.dump_json(_scoreboard.validate_python(match))
+
 
 @router.get("/{region}/{puuid}", response_model=List[ParticipationBase])
 @limiter.limit("30/minute")
-async def get_matches(request: Request, region: str, puuid: str, db: Session = Depends(get_session)):
-    
-    # 1. Check Redis Cache
-    cache_key = f"player_matches_{puuid}"
-    cached_data = redis_client.get(cache_key)
-    if cached_data:
-        return json.loads(cached_data)
+async def get_matches(request: Request, region: str, puuid: str, db: AsyncSession = Depends(get_async_session)):
 
-    # 2. If not in cache, query DB
-    statement = (
-        select(MatchParticipation)
-        .join(Match)
-        .where(MatchParticipation.puuid == puuid)
-        .order_by(desc(MatchParticipation.start_time))
-        .limit(20)
-    )
+    # Cached bytes are returned as-is; one request per key rebuilds on a miss
+    # or expiry while the rest get the stale copy (or wait for the new one)
+    body = await matches_cache.get_or_build(history_cache_key(puuid), lambda: build_history(puuid))
+    if body is not None:
+        return json_response(body, request)
 
-    matches = db.exec(statement).all()
-    
     # Check if we should create a placeholder user (Smart Sync optimization)
-    if len(matches) == 0:
-        users_in_db = select(User).where(User.puuid == puuid)
-        user_in_db = db.exec(users_in_db).first()
-        if not user_in_db:
-             new_user = User(puuid=puuid, region=region, user_id="Unknown", user_tag="Unknown")
-             db.add(new_user)
-             db.commit()
-
-    # 3. Store in Redis cache for 5 minutes (300 seconds)
-    if matches:
-        from schemas.match_schema import ParticipationBase
-        from fastapi.encoders import jsonable_encoder
-        
-        # Convert the raw database models into our clean Pydantic schema first!
-        # This strips the cyclic Match -> Participation relationship that crashes jsonable_encoder
-        safe_matches = [ParticipationBase.model_validate(m) for m in matches]
-        matches_dict = jsonable_encoder(safe_matches)
-        
-        redis_client.setex(cache_key, 300, json.dumps(matches_dict))
+    users_in_db = select(User).where(User.puuid == puuid)
+    user_in_db = (await db.exec(users_in_db)).first()
+    if not user_in_db:
+         new_user = User(puuid=puuid, region=region, user_id="Unknown", user_tag="Unknown")
+         db.add(new_user)
+         await db.commit()
 
-    return matches
+    return json_response(b"[]", request)
 
 
 @router.post("/{region}/{puuid}/update")
 @limiter.limit("5/minute")
-def trigger_match_update(request: Request, region: str, puuid: str):
+def trigger_match_update(
+    request: Request, region: str, puuid: str, pages: int | None = Query(None, ge=1, le=10)
+):
     """
     Triggers the background Celery task to fetch the latest matches.
+    Pass `pages` to backfill deeper history (10 matches per page).
     """
-    task = fetch_matches_task.delay(puuid, region)
+    task = fetch_matches_task.delay(puuid, region, pages)
     return {"task_id": task.id, "status": "processing"}
 
 
@@ -124,13 +135,13 @@ def get_update_status(task_id: str):
 
 @router.get("/{match_id}", response_model=MatchScoreboard)
 @limiter.limit("60/minute")
-def get_match_by_id(request: Request, match_id: str, db: Session = Depends(get_session)):
+async def get_match_by_id(request: Request, match_id: str):
 
-    match_service = MatchService()
+    body = await scoreboard_cache.get_or_build(scoreboard_cache_key(match_id), lambda: _build_scoreboard(match_id))
+    if body is None:
+        raise HTTPException(status_code=404, detail="Match not found")
 
-    match_detail = match_service.get_match_detail(match_id, db)
-
-    return match_detail
+    return json_response(body, request, headers=IMMUTABLE_HEADERS)
 
 
 # @router.get("/", response_model=List[Match])
@@ -146,6 +157,17 @@ def refresh_matches_cache(db: Session = Depends(get_session)):
     # 2. Delete the Parents (Matches) SECOND
     statement2 = delete(Match)
     db.exec(statement2)
+
+    # 3. Rolling stats aggregate the deleted matches: drop them too
+    db.exec(delete(PlayerStats))
     db.commit()
+
+    # Cached scoreboards (every version) never expire on their own
+    r = get_redis()
+    keys = list(r.scan_iter(match="scoreboard:*", count=1000))
+    for i in range(0, len(keys), 1000):
+        r.delete(*keys[i:i + 1000])
+    # Other workers drop theirs within SCOREBOARD_CACHE_LOCAL_TTL
+    scoreboard_cache.clear_local()
     return {"message": "Cache is cleared. Pantry is now empty"}
 
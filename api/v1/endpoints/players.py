@@ -1,15 +1,41 @@
 from fastapi import APIRouter
 from services.riot_client import RiotClient
 from services.player_service import PlayerService
-from fastapi import APIRouter, Depends
-from sqlmodel import Session
-from core.database import get_session
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+from core.config import settings
+from core.database import get_async_session
+from services.analytics import aggregate_window
+from services.player_stats_service import get_player_stats, summarize
 
 router = APIRouter()
 
 
+@router.get("/by-puuid/{puuid}/stats")
+async def get_stats(
+    puuid: str,
+    limit: int | None = Query(None, ge=1, le=settings.ANALYSIS_MAX_MATCHES),
+    since: datetime | None = None,
+    until: datetime | None = None,
+    season: str | None = None,
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Rolling stats over the player's recent matches (one row lookup), or
+    over a custom window (last N, date range, act) aggregated in SQL.
+    """
+    if limit or since or until or season:
+        return await aggregate_window(puuid, db, limit=limit, since=since, until=until, season=season)
+
+    stats = await get_player_stats(puuid, db)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="No stats for this player yet")
+    return summarize(stats)
+
+
 @router.get("/{player_name}/{player_tag}")
-async def get_player_info(player_name: str, player_tag: str, db: Session = Depends(get_session)):
+async def get_player_info(player_name: str, player_tag: str, db: AsyncSession = Depends(get_async_session)):
     service = PlayerService()
 
     puuid, region = await service.get_player_info(player_name, player_tag, db)
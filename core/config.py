@@ -9,6 +9,96 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "ValorTracker"
     API_V1_STR: str = "/api/v1"
 
+    # Match history backfill: how many 10-match pages a sync walks,
+    # and how many of those page requests may be in flight at once.
+    MATCH_BACKFILL_PAGES: int = 2
+    MATCH_BACKFILL_CONCURRENCY: int = 2
+    # List match ids first and skip the v4 download for pages whose matches
+    # another player's sync already stored. Costs one extra listing call per
+    # page that does need downloading, so it only pays off when most tracked
+    # players share lobbies.
+    MATCH_SYNC_BY_ID: bool = False
+
+    # Number of most recent matches the player_stats table aggregates
+    PLAYER_STATS_WINDOW: int = 20
+    # Custom analysis windows (season reports) are capped at this many matches
+    ANALYSIS_MAX_MATCHES: int = 1000
+    # "Recent form" size for trend detection (last N vs the rest of the window)
+    TREND_RECENT_MATCHES: int = 5
+
+    # Match history response cache: Redis TTL, plus a short in-process tier
+    # in front (bounds how long a process can serve a history the worker
+    # just invalidated)
+    MATCHES_CACHE_TTL: int = 300
+    MATCHES_CACHE_LOCAL_TTL: float = 5.0
+    MATCHES_CACHE_LRU_SIZE: int = 1024
+    # How long past its TTL a history may still be served while one request
+    # rebuilds it, and how long that request holds the rebuild lock
+    MATCHES_CACHE_STALE_TTL: int = 3600
+    MATCHES_CACHE_LOCK_MS: int = 5000
+    # Players with no matches yet are remembered as such for this long, so
+    # concurrent requests for them do not each hit the database
+    MATCHES_CACHE_MISS_TTL: int = 5
+
+    # Match scoreboards never change once played: cached forever in Redis,
+    # this many kept in process. The local copies expire so a /refresh on
+    # another worker is picked up within SCOREBOARD_CACHE_LOCAL_TTL seconds
+    SCOREBOARD_CACHE_LRU_SIZE: int = 2048
+    SCOREBOARD_CACHE_LOCAL_TTL: int = 60
+
+    # Coaching report cache (Redis + in-process LRU front)
+    REPORT_CACHE_TTL: int = 24 * 3600
+    REPORT_CACHE_LRU_SIZE: int = 512
+    REPORT_CACHE_CHUNK_SIZE: int = 64
+    # LLM generations running at once per API process; later reports queue
+    REPORT_MAX_CONCURRENT_GENERATIONS: int = 8
+
+    # In-process front of the Redis query-embedding cache (entries)
+    EMBEDDING_CACHE_LRU_SIZE: int = 2048
+    # "gemini", or "local" for the offline hashing encoder (CI, load tests)
+    EMBEDDING_PROVIDER: str = "gemini"
+    # Stored embedding size. Gemini embeddings are Matryoshka-trained, so they
+    # are truncated to this many dimensions and re-normalized. Changing it
+    # needs a migration of coachingtip.embedding and a re-seed.
+    EMBEDDING_DIM: int = 768
+    # HNSW candidate list size per search (higher = better recall, slower)
+    VECTOR_EF_SEARCH: int = 40
+    # In-process tip index: snapshot location, corpus limit (above it searches
+    # go to pgvector) and how often processes check for re-seeded tips
+    VECTOR_INDEX_DIR: str = ".cache/vector_index"
+    VECTOR_INDEX_MAX_TIPS: int = 50_000
+    VECTOR_INDEX_REFRESH_SECONDS: float = 30.0
+
+    # Report writer: "gemini", or "fake" to stream a canned report locally
+    # (load tests) with the given first-token latency and token rate
+    LLM_PROVIDER: str = "gemini"
+    LLM_TIER_MODELS: dict[str, str] = {"free": "gemini-2.5-flash", "premium": "gemini-2.5-pro"}
+    LLM_DEFAULT_TIER: str = "free"
+    LLM_FAKE_FIRST_TOKEN_LATENCY: float = 0.5
+    LLM_FAKE_TOKENS_PER_SECOND: float = 50.0
+    # Idle time before a `: ping` comment is sent on a report stream
+    SSE_HEARTBEAT_SECONDS: float = 5.0
+
+    # Shared Redis connection pools (per process, sync and async each): size,
+    # how long a caller waits for a free connection, and how long a
+    # connection may sit idle before it is PINGed on reuse
+    REDIS_MAX_CONNECTIONS: int = 20
+    REDIS_POOL_TIMEOUT: float = 5.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+
+    # Pooled upstream HTTP client (HenrikDev, valorant-api.com)
+    HTTP_MAX_CONNECTIONS: int = 50
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0
+
+    # HenrikDev token bucket, shared by the API and every worker ("redis" or "memory")
+    UPSTREAM_GOVERNOR_BACKEND: str = "redis"
+    UPSTREAM_RATE_PER_MINUTE: float = 30
+    UPSTREAM_BURST: int = 30
+    # Fraction of the bucket background backfills leave for interactive lookups
+    UPSTREAM_BACKGROUND_RESERVE: float = 0.3
+    UPSTREAM_INTERACTIVE_MAX_WAIT: float = 10.0
+
     model_config = SettingsConfigDict(
         env_file=os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"),
         env_ignore_empty=True,
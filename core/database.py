@@ -1,8 +1,36 @@
 from core.config import settings
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import Session, create_engine, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+# Sync engine — Celery tasks, Alembic, scripts and the remaining sync endpoints
 engine = create_engine(settings.CONNECTION_STRING, echo=True)
 
+
+def _async_url(url: str):
+    """Point CONNECTION_STRING at asyncpg, translating libpq-only options."""
+    u = make_url(url)
+    query = dict(u.query)
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)
+    connect_args = {"ssl": sslmode} if sslmode and sslmode != "disable" else {}
+    return u.set(drivername="postgresql+asyncpg", query=query), connect_args
+
+
+_async_db_url, _async_connect_args = _async_url(settings.CONNECTION_STRING)
+
+# Async engine — the FastAPI request path, so queries never block the event loop
+async_engine = create_async_engine(
+    _async_db_url, connect_args=_async_connect_args, pool_pre_ping=True
+)
+
+
 def get_session():
     with Session(engine) as session:
         yield session
+
+
+async def get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
@@ -0,0 +1,37 @@
+"""
+Upstream HTTP client — one pooled httpx.AsyncClient per process.
+Shared by RiotClient, MatchService and AgentService so HenrikDev and
+valorant-api.com calls reuse warm HTTP/2 keep-alive connections instead of
+paying a TCP+TLS handshake on every call.
+
+The API opens/closes it in the FastAPI lifespan; Celery worker processes
+create it lazily and keep it for the life of the process.
+"""
+import httpx
+from core.config import settings
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _client
+
+
+async def close_http_client():
+    """Close the pooled client (lifespan shutdown / worker process exit)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -1,8 +1,19 @@
 """
 Rate Limiter — shared instance for the entire app.
 Extracted to avoid circular imports between main.py and endpoint routers.
+
+Counters live in Redis (on the shared connection pool), so limits hold
+across every API process; if Redis is unreachable the limiter falls back
+to per-process memory rather than failing requests.
 """
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from core.config import settings
+from core.redis import get_redis_pool
 
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=settings.REDIS_URL,
+    storage_options={"connection_pool": get_redis_pool()},
+    in_memory_fallback_enabled=True,
+)
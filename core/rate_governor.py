@@ -0,0 +1,141 @@
+"""
+Upstream Rate Governor — a token bucket shared by every HenrikDev call.
+
+HenrikDev limits are global to our ACCESS_TOKEN, so the bucket lives in Redis
+and is drained atomically (Lua) by the API and every Celery worker alike.
+The "memory" backend keeps the same bucket in-process for tests and local
+runs, and is also used if Redis is unreachable.
+
+Priority classes: INTERACTIVE calls (player lookups, /matches/demo) may empty
+the bucket; BACKGROUND calls (backfills) stop while fewer than
+UPSTREAM_BACKGROUND_RESERVE of the tokens are left, so a busy worker can
+never starve a user who is waiting on a page.
+"""
+import asyncio
+import hashlib
+import time
+
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+from core.config import settings
+from core.redis import get_async_redis
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# KEYS[1] = bucket key
+# ARGV = rate (tokens/s), capacity, floor (tokens that must remain), drain flag
+# Returns the seconds to wait before a token is available ("0" = granted).
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local floor = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if ARGV[4] == '1' then
+    tokens = 0
+elseif tokens - 1 >= floor then
+    tokens = tokens - 1
+else
+    wait = (floor + 1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) * 2)
+return tostring(wait)
+"""
+
+
+class LocalTokenBucket:
+    """Same algorithm as _TAKE_SCRIPT, for a single process."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.ts = time.monotonic()
+
+    def take(self, floor: float, drain: bool = False) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+        if drain:
+            self.tokens = 0
+            return 0.0
+        if self.tokens - 1 >= floor:
+            self.tokens -= 1
+            return 0.0
+        return (floor + 1 - self.tokens) / self.rate
+
+
+class UpstreamGovernor:
+    def __init__(
+        self,
+        key: str,
+        rate_per_minute: float,
+        burst: int,
+        background_reserve: float,
+        backend: str = "redis",
+    ):
+        self.key = key
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst
+        self.background_floor = burst * background_reserve
+        self.backend = backend
+        self._local = LocalTokenBucket(self.rate, self.capacity)
+        self._redis = None
+        self._script = None
+
+    async def _take(self, floor: float, drain: bool = False) -> float:
+        if self.backend == "redis":
+            try:
+                if self._script is None:
+                    self._redis = get_async_redis()
+                    self._script = self._redis.register_script(_TAKE_SCRIPT)
+                wait = await self._script(
+                    keys=[self.key],
+                    args=[self.rate, self.capacity, floor, "1" if drain else "0"],
+                )
+                return float(wait)
+            except RedisError as e:
+                print(f"[Governor] Redis unavailable, using local bucket: {e}")
+        return self._local.take(floor, drain)
+
+    async def acquire(self, priority: str = INTERACTIVE, max_wait: float | None = None):
+        """
+        Wait until a token is available for this priority class.
+        Raises 429 if an interactive caller would wait longer than max_wait.
+        """
+        floor = 0 if priority == INTERACTIVE else self.background_floor
+        if max_wait is None and priority == INTERACTIVE:
+            max_wait = settings.UPSTREAM_INTERACTIVE_MAX_WAIT
+
+        waited = 0.0
+        while True:
+            wait = await self._take(floor)
+            if wait <= 0:
+                return
+            if max_wait is not None and waited + wait > max_wait:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Upstream rate limit reached. Please try again in a few seconds.",
+                )
+            await asyncio.sleep(wait)
+            waited += wait
+
+    async def drain(self):
+        """Empty the bucket after an upstream 429 so every caller backs off."""
+        await self._take(0, drain=True)
+
+
+upstream_governor = UpstreamGovernor(
+    key="upstream_bucket:" + hashlib.sha1(settings.ACCESS_TOKEN.encode()).hexdigest()[:12],
+    rate_per_minute=settings.UPSTREAM_RATE_PER_MINUTE,
+    burst=settings.UPSTREAM_BURST,
+    background_reserve=settings.UPSTREAM_BACKGROUND_RESERVE,
+    backend=settings.UPSTREAM_GOVERNOR_BACKEND,
+)
@@ -0,0 +1,73 @@
+"""
+Redis clients — one pooled client per process, shared by the API, the
+worker, the rate limiter and the caches.
+
+Connections are opened once and reused (a fresh TLS handshake to Upstash per
+task or per request is a noticeable slice of latency):
+- get_redis(): sync client (worker, limiter, knowledge base, vector index),
+- get_async_redis(): asyncio client (response/report caches, governor).
+
+Both sit on blocking pools of at most REDIS_MAX_CONNECTIONS connections
+(callers wait up to REDIS_POOL_TIMEOUT for a free one instead of failing),
+and idle connections are health-checked (PING) before reuse. The async pool
+belongs to the event loop that first uses it: the API's loop, or the
+worker's persistent loop (worker.run_async).
+
+This is also the one place that handles the Upstash TLS URL.
+"""
+import ssl
+import redis
+import redis.asyncio as aioredis
+from core.config import settings
+
+_pools: dict = {}
+_async_pools: dict = {}
+
+
+def _url_and_options() -> tuple[str, dict]:
+    url = settings.REDIS_URL.replace("?ssl_cert_reqs=CERT_NONE", "")
+    options = {"ssl_cert_reqs": ssl.CERT_NONE} if "rediss://" in url else {}
+    return url, options
+
+
+def _pool_options(decode_responses: bool) -> dict:
+    url, options = _url_and_options()
+    return {
+        "url": url,
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "timeout": settings.REDIS_POOL_TIMEOUT,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+        "socket_keepalive": True,
+        "decode_responses": decode_responses,
+        **options,
+    }
+
+
+def get_redis_pool(decode_responses: bool = False) -> redis.BlockingConnectionPool:
+    pool = _pools.get(decode_responses)
+    if pool is None:
+        pool = redis.BlockingConnectionPool.from_url(**_pool_options(decode_responses))
+        _pools[decode_responses] = pool
+    return pool
+
+
+def get_redis(decode_responses: bool = False) -> redis.Redis:
+    return redis.Redis(connection_pool=get_redis_pool(decode_responses))
+
+
+def get_async_redis(decode_responses: bool = False) -> aioredis.Redis:
+    pool = _async_pools.get(decode_responses)
+    if pool is None:
+        pool = aioredis.BlockingConnectionPool.from_url(**_pool_options(decode_responses))
+        _async_pools[decode_responses] = pool
+    return aioredis.Redis(connection_pool=pool)
+
+
+async def close_redis():
+    """Disconnect every pooled connection (app/worker shutdown)."""
+    for pool in _async_pools.values():
+        await pool.disconnect()
+    _async_pools.clear()
+    for pool in _pools.values():
+        pool.disconnect()
+    _pools.clear()
@@ -0,0 +1,205 @@
+"""
+Response cache for read-heavy JSON endpoints.
+
+Bodies are cached already serialized, so a hit skips both JSON encoding and
+response_model validation and is returned as-is in a Response:
+- tier 1: in-process LRU with a short TTL (hot keys never leave the process),
+- tier 2: async Redis (the shared pool), shared by every API process.
+
+Every response carries an ETag derived from the body; a matching
+If-None-Match gets an empty 304.
+
+Stampede control (get_or_build):
+- Entries have a soft TTL and live on in Redis for `stale_ttl` longer. A
+  stale entry is still served while one request rebuilds it in the background
+  (stale-while-revalidate).
+- Rebuilds are guarded by a short Redis lock (SET NX PX): one request
+  rebuilds, the others serve stale data or wait for the new value.
+- A build that finds nothing (None) is cached as an empty "miss" entry for
+  `miss_ttl` seconds, so waiters get the answer instead of building again.
+  Waiters also stop polling as soon as the rebuild lock is released.
+- Fresh entries are refreshed early with a probability that rises as the soft
+  TTL nears, scaled by how long the last rebuild took (XFetch), so hot keys
+  rarely expire at all.
+- After ingestion the worker writes fresh entries itself (pack_entry,
+  services/match_history.py), so readers rarely see a miss at all.
+
+With redis_ttl=None entries never expire (immutable bodies, e.g. finished
+match scoreboards): they are built once and then only ever read.
+
+Redis values are `<soft expiry><rebuild seconds>` (two big-endian doubles)
+followed by the body (empty for a cached miss).
+"""
+import asyncio
+import hashlib
+import math
+import random
+import struct
+import time
+import uuid
+from fastapi import Request, Response
+from redis.exceptions import RedisError
+from core.lru import LRUCache
+from core.redis import get_async_redis
+
+_HEADER = struct.Struct(">dd")
+
+_UNLOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def json_response(body: bytes, request: Request, headers: dict | None = None) -> Response:
+    """200 with the cached body, or 304 if the client already has it."""
+    etag = etag_for(body)
+    headers = {**(headers or {}), "ETag": etag}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def pack_entry(body: bytes, soft_ttl: float | None, delta: float = 0.0) -> bytes:
+    """Redis value for `body`, fresh for `soft_ttl` seconds from now (None: forever)."""
+    soft_expiry = math.inf if soft_ttl is None else time.time() + soft_ttl
+    return _HEADER.pack(soft_expiry, delta) + body
+
+
+class ResponseCache:
+    def __init__(self, lru_size: int, local_ttl: float | None, redis_ttl: int | None,
+                 stale_ttl: int = 0, lock_ms: int = 5000, beta: float = 1.0, miss_ttl: int = 0):
+        self.redis_ttl = redis_ttl
+        self.stale_ttl = stale_ttl
+        self.miss_ttl = miss_ttl
+        self.lock_ms = lock_ms
+        self.beta = beta
+        self._local = LRUCache(maxsize=lru_size, ttl=local_ttl)
+        self._background = set()
+
+    def _get_redis(self):
+        return get_async_redis()
+
+    # ─── Entries ──────────────────────────────────────────────────────────
+
+    async def _read(self, key: str) -> tuple[float, float, bytes] | None:
+        entry = self._local.get(key)
+        if entry is not None:
+            return entry
+        try:
+            raw = await self._get_redis().get(key)
+        except RedisError as e:
+            print(f"[ResponseCache] Redis read failed: {e}")
+            return None
+        if raw is None or len(raw) < _HEADER.size:
+            return None
+        soft_expiry, delta = _HEADER.unpack_from(raw)
+        entry = (soft_expiry, delta, raw[_HEADER.size:])
+        self._local.set(key, entry)
+        return entry
+
+    def clear_local(self):
+        """Drop this process's in-memory tier (Redis entries are untouched)."""
+        self._local.clear()
+
+    async def get(self, key: str) -> bytes | None:
+        entry = await self._read(key)
+        return (entry[2] or None) if entry is not None else None
+
+    async def set(self, key: str, body: bytes, delta: float = 0.0):
+        value = pack_entry(body, self.redis_ttl, delta)
+        self._local.set(key, (_HEADER.unpack_from(value)[0], delta, body))
+        ex = None if self.redis_ttl is None else self.redis_ttl + self.stale_ttl
+        try:
+            await self._get_redis().set(key, value, ex=ex)
+        except RedisError as e:
+            print(f"[ResponseCache] Redis write failed: {e}")
+
+    async def _set_miss(self, key: str):
+        value = pack_entry(b"", self.miss_ttl)
+        self._local.set(key, (_HEADER.unpack_from(value)[0], 0.0, b""),
+                        ttl=min(self._local.ttl or self.miss_ttl, self.miss_ttl))
+        try:
+            await self._get_redis().set(key, value, ex=self.miss_ttl)
+        except RedisError as e:
+            print(f"[ResponseCache] Redis write failed: {e}")
+
+    # ─── Stampede control ─────────────────────────────────────────────────
+
+    async def _lock(self, key: str) -> str | None:
+        token = uuid.uuid4().hex
+        try:
+            if await self._get_redis().set(f"lock:{key}", token, nx=True, px=self.lock_ms):
+                return token
+        except RedisError as e:
+            # No Redis, no coordination: rebuild locally
+            print(f"[ResponseCache] Redis lock failed: {e}")
+            return token
+        return None
+
+    async def _locked(self, key: str) -> bool:
+        try:
+            return bool(await self._get_redis().exists(f"lock:{key}"))
+        except RedisError:
+            return False
+
+    async def _unlock(self, key: str, token: str):
+        try:
+            await self._get_redis().eval(_UNLOCK, 1, f"lock:{key}", token)
+        except RedisError:
+            pass
+
+    async def _rebuild(self, key: str, build, token: str) -> bytes | None:
+        try:
+            started = time.monotonic()
+            body = await build()
+            if body is not None:
+                await self.set(key, body, delta=time.monotonic() - started)
+            elif self.miss_ttl:
+                await self._set_miss(key)
+            return body
+        finally:
+            await self._unlock(key, token)
+
+    def _needs_refresh(self, soft_expiry: float, delta: float) -> bool:
+        # XFetch: now - delta * beta * ln(U) >= expiry, U ~ (0, 1]
+        return time.time() - delta * self.beta * math.log(1.0 - random.random()) >= soft_expiry
+
+    async def get_or_build(self, key: str, build, wait: float = 2.0) -> bytes | None:
+        """
+        Cached body for `key`, or the result of `await build()` (cached unless
+        None). `build` must not depend on the request: it may run after the
+        response has been sent.
+        """
+        entry = await self._read(key)
+        if entry is not None:
+            soft_expiry, delta, body = entry
+            if self._needs_refresh(soft_expiry, delta):
+                token = await self._lock(key)
+                if token is not None:
+                    # Local tier must not keep serving the stale copy either
+                    self._local.pop(key)
+                    task = asyncio.create_task(self._rebuild(key, build, token))
+                    self._background.add(task)
+                    task.add_done_callback(self._background.discard)
+            return body or None
+
+        token = await self._lock(key)
+        if token is not None:
+            return await self._rebuild(key, build, token)
+
+        # Someone else is rebuilding: wait briefly for their value (or miss)
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            entry = await self._read(key)
+            if entry is not None:
+                return entry[2] or None
+            if not await self._locked(key):
+                break  # They finished without caching anything
+        return await build()
@@ -0,0 +1,59 @@
+"""
+Server-Sent Events framing for streamed responses.
+
+sse_stream wraps an async generator of text chunks:
+- every text chunk becomes a `data:` event (multi-line chunks keep their
+  newlines); an `(event, data)` tuple becomes a named event,
+- a `: ping` comment goes out whenever the source is quiet for
+  SSE_HEARTBEAT_SECONDS (e.g. while waiting for the first LLM token), which
+  keeps proxies from timing out and lets us notice a dead client,
+- the stream always ends with `event: done`,
+- if the client disconnects, the source generator is cancelled and closed,
+  so no more upstream work is done for a reader who is gone.
+"""
+import asyncio
+import contextlib
+from fastapi import Request
+from core.config import settings
+
+HEARTBEAT = ": ping\n\n"
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(data: str, event: str | None = None) -> str:
+    lines = [f"event: {event}"] if event else []
+    lines += [f"data: {line}" for line in data.split("\n")]
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse_stream(chunks, request: Request, heartbeat: float | None = None):
+    heartbeat = heartbeat or settings.SSE_HEARTBEAT_SECONDS
+    iterator = chunks.__aiter__()
+    pending = asyncio.ensure_future(iterator.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({pending}, timeout=heartbeat)
+            if not done:
+                if await request.is_disconnected():
+                    return
+                yield HEARTBEAT
+                continue
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                break
+            if await request.is_disconnected():
+                return
+            if isinstance(chunk, tuple):
+                event, data = chunk
+                yield sse_event(data, event=event)
+            else:
+                yield sse_event(chunk)
+            pending = asyncio.ensure_future(iterator.__anext__())
+        yield sse_event("{}", event="done")
+    finally:
+        if not pending.done():
+            pending.cancel()
+            with contextlib.suppress(asyncio.CancelledError, StopAsyncIteration):
+                await pending
+        await iterator.aclose()
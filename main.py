@@ -1,4 +1,6 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -8,25 +10,40 @@ from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from core.config import settings
 from core.database import engine
+from core.http_client import get_http_client, close_http_client
+from core.redis import close_redis
 from core.limiter import limiter
+from services import vector_index
 from api.v1.api import api_router
 # Import models so SQLModel knows about them
 from models.match import Match, MatchParticipation
 from models.user import User
+from models.player_stats import PlayerStats
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create all tables on startup
+    SQLModel.metadata.create_all(engine)
+    # Open the pooled upstream client once; every request reuses its connections
+    get_http_client()
+    # Load the coaching tip index (memory-mapped snapshot when it is current)
+    await asyncio.to_thread(vector_index.warm)
+    yield
+    await close_http_client()
+    await close_redis()
+
 
 app = FastAPI(
-    title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    title=settings.PROJECT_NAME,
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 # Attach limiter to app
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-# Create all tables on startup
-@app.on_event("startup")
-def on_startup():
-    SQLModel.metadata.create_all(engine)
-
 origins = [
     "http://localhost:5173", # Vite local dev
     "https://valorant-frontend-nine.vercel.app", # Your live Vercel frontend
@@ -0,0 +1,48 @@
+"""backfill match season
+
+Revision ID: a4f9c2e71d3b
+Revises: e2a5c8f13b77
+Create Date: 2026-10-18 18:05:31.220917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4f9c2e71d3b'
+down_revision: Union[str, Sequence[str], None] = 'e2a5c8f13b77'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Matches stored before c3e8a1f05d92 have no season. Acts are contiguous
+    # date ranges, so a match played between the first and last stored match
+    # of one act (and inside no other act's span) belongs to that act.
+    # Anything outside every known span stays NULL; season windows report
+    # those rows as unclassified_matches.
+    op.execute(
+        """
+        WITH spans AS (
+            SELECT season, min(start_time) AS lo, max(start_time) AS hi
+            FROM match
+            WHERE season IS NOT NULL
+            GROUP BY season
+        )
+        UPDATE match m
+        SET season = s.season
+        FROM spans s
+        WHERE m.season IS NULL
+          AND m.start_time BETWEEN s.lo AND s.hi
+          AND (SELECT count(*) FROM spans o WHERE m.start_time BETWEEN o.lo AND o.hi) = 1
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Backfilled and ingested seasons are indistinguishable; keep them.
+    pass
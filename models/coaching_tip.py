@@ -1,15 +1,34 @@
 """
 CoachingTip model — stores coaching content with pgvector embeddings.
+
+This is the one definition of the table (models/knowledge.py re-exports it).
+Embeddings are settings.EMBEDDING_DIM wide, unit length, and searched with
+cosine distance through an HNSW index. `content_hash` (md5 of content) and
+`embedding_model` ("<model>@<dim>") let the seed script sync incrementally.
 """
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Column
 from pgvector.sqlalchemy import Vector
+from core.config import settings
 
 
 class CoachingTip(SQLModel, table=True):
+    __table_args__ = (
+        Index(
+            "ix_coachingtip_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     content: str
     agent: str            # agent name or "all"
     map_name: str         # map name or "all"
     category: str         # e.g. "aim", "positioning", "economy"
-    embedding: list[float] = Field(sa_column=Column(Vector(3072)))
+    content_hash: str = Field(unique=True, index=True)
+    embedding_model: Optional[str] = None
+    embedding: list[float] = Field(sa_column=Column(Vector(settings.EMBEDDING_DIM)))
@@ -13,6 +13,7 @@ class Match(SQLModel, table=True):
     duration_ms: int  # Duration in milliseconds
     winning_team: str  # "Blue" or "Red"
     rounds_play : int
+    season: Optional[str] = Field(default=None, index=True)  # Act short id, e.g. "e9a3"
 
     blue_team_score: int
     red_team_score: int
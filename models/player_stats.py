@@ -0,0 +1,36 @@
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+
+class PlayerStats(SQLModel, table=True):
+    """
+    Rolling per-player aggregates over the last `window_size` matches.
+    Maintained incrementally by match ingestion (services/player_stats_service.py)
+    so reports can read a player's stats with one primary-key lookup.
+    """
+    __tablename__ = "player_stats"
+    puuid: str = Field(primary_key=True)
+    window_size: int
+    matches: int = 0
+
+    # Running sums of the per-match values (sums of squares for stdev)
+    sum_kd: float = 0
+    sum_kd_sq: float = 0
+    sum_acs: float = 0
+    sum_acs_sq: float = 0
+    sum_adr: float = 0
+    sum_hs: float = 0
+    sum_dpr: float = 0
+    sum_position: float = 0
+    wins: int = 0
+    top2: int = 0
+    bottom2: int = 0
+    mvps: int = 0
+
+    # {"Bind": {"games": 4, "wins": 2, "sum_kd": 4.1, "sum_acs": 812.0}, ...}
+    maps: dict = Field(default_factory=dict, sa_column=Column(JSONB, nullable=False))
+    agents: dict = Field(default_factory=dict, sa_column=Column(JSONB, nullable=False))
+    # Per-match entries currently in the window, newest first
+    recent: list = Field(default_factory=list, sa_column=Column(JSONB, nullable=False))
+
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
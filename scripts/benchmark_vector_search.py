@@ -0,0 +1,87 @@
+"""
+Vector Search Benchmark — HNSW recall and latency against exact search.
+
+Uses stored tip embeddings, with a little noise added, as queries. For each
+query the exact top-k (sequential scan, index disabled) is compared with the
+HNSW top-k at several hnsw.ef_search values. Prints recall@k and p50/p95
+latency per setting, to help choose settings.VECTOR_EF_SEARCH.
+
+Usage:
+    docker-compose exec backend python scripts/benchmark_vector_search.py [queries] [top_k]
+"""
+
+import sys
+import os
+import time
+
+# Add the backend root to the path so imports work
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from core import database
+database.engine.echo = False  # Quiet SQL logs
+
+import numpy as np
+from sqlmodel import Session, select, text
+from core.database import engine
+from models.coaching_tip import CoachingTip
+
+EF_SEARCH_VALUES = [10, 20, 40, 80, 160]
+NOISE = 0.05
+
+
+def _top_k(db: Session, query: list[float], top_k: int) -> tuple[list[int], float]:
+    stmt = (
+        select(CoachingTip.id)
+        .order_by(CoachingTip.embedding.cosine_distance(query))
+        .limit(top_k)
+    )
+    started = time.perf_counter()
+    ids = list(db.exec(stmt).all())
+    return ids, (time.perf_counter() - started) * 1000
+
+
+def _report(label: str, recalls: list[float], latencies: list[float]):
+    p50, p95 = np.percentile(latencies, [50, 95])
+    print(f"  {label:<16} recall={np.mean(recalls):.3f}  p50={p50:.2f}ms  p95={p95:.2f}ms")
+
+
+def benchmark(num_queries: int = 200, top_k: int = 3):
+    rng = np.random.default_rng(0)
+
+    with Session(engine) as db:
+        vectors = np.array(db.exec(select(CoachingTip.embedding)).all(), dtype=np.float32)
+        if len(vectors) == 0:
+            print("[Bench] coachingtip is empty. Seed it first.")
+            return
+        print(f"[Bench] {len(vectors)} tips, dim={vectors.shape[1]}, {num_queries} queries, k={top_k}")
+
+        picks = vectors[rng.integers(0, len(vectors), num_queries)]
+        queries = picks + rng.normal(0, NOISE, picks.shape).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries.tolist()
+
+        # Ground truth: exact scan
+        db.exec(text("SET LOCAL enable_indexscan = off"))
+        exact, latencies = [], []
+        for q in queries:
+            ids, ms = _top_k(db, q, top_k)
+            exact.append(set(ids))
+            latencies.append(ms)
+        _report("exact", [1.0] * len(queries), latencies)
+        db.rollback()
+
+        for ef in EF_SEARCH_VALUES:
+            db.exec(text("SET LOCAL enable_seqscan = off"))
+            db.exec(text(f"SET LOCAL hnsw.ef_search = {int(ef)}"))
+            recalls, latencies = [], []
+            for q, truth in zip(queries, exact):
+                ids, ms = _top_k(db, q, top_k)
+                recalls.append(len(truth & set(ids)) / len(truth))
+                latencies.append(ms)
+            _report(f"hnsw ef={ef}", recalls, latencies)
+            db.rollback()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    benchmark(*args)
@@ -0,0 +1,69 @@
+"""
+Report Load Test — concurrent requests against the coaching report stream.
+
+Prints time-to-first-byte and total time (p50/p95/max) for the report
+endpoint. Run the API with LLM_PROVIDER=fake (and EMBEDDING_PROVIDER=local)
+to measure our own stack without Gemini in the way. Finished reports are
+cached per player, so pass several puuids or flush Redis between runs to
+measure generation rather than replay.
+
+Usage:
+    python scripts/load_test_reports.py http://localhost:8000 <puuid> [<puuid> ...] \
+        [--requests 100] [--concurrency 20]
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+
+async def one_request(client: httpx.AsyncClient, url: str) -> tuple[float, float, int]:
+    started = time.perf_counter()
+    ttfb = None
+    size = 0
+    async with client.stream("GET", url) as response:
+        async for chunk in response.aiter_bytes():
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+            size += len(chunk)
+    total = time.perf_counter() - started
+    return ttfb if ttfb is not None else total, total, size
+
+
+async def run(base_url: str, puuids: list[str], requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def bounded(i: int):
+            async with semaphore:
+                return await one_request(client, f"/api/v1/ai/report/{puuids[i % len(puuids)]}")
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(bounded(i) for i in range(requests)), return_exceptions=True)
+        elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if not isinstance(r, Exception)]
+    failed = len(results) - len(ok)
+    print(f"[Load] {requests} requests, concurrency {concurrency}: {len(ok)} ok, {failed} failed "
+          f"in {elapsed:.2f}s ({len(ok) / elapsed:.1f} req/s)")
+    if not ok:
+        return
+    ttfb = np.array([r[0] for r in ok]) * 1000
+    total = np.array([r[1] for r in ok]) * 1000
+    for label, values in (("ttfb", ttfb), ("total", total)):
+        p50, p95 = np.percentile(values, [50, 95])
+        print(f"  {label:<6} p50={p50:.0f}ms  p95={p95:.0f}ms  max={values.max():.0f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base_url")
+    parser.add_argument("puuids", nargs="+")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.base_url, args.puuids, args.requests, args.concurrency))
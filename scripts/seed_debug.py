@@ -5,19 +5,18 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 from core import database
 database.engine.echo = False  # Quiet SQL logs
 
-from google import genai
-from google.genai import types
 from sqlmodel import Session, select, text
-from core.config import settings
 from core.database import engine
 from models.coaching_tip import CoachingTip
+from services.embeddings import get_embedding_provider
+from services.knowledge_base import content_hash, embedding_model_tag
+from services.vector_index import bump_version
 from services.coaching_knowledge import COACHING_KNOWLEDGE
 
-EMBEDDING_MODEL = "gemini-embedding-001"
 BATCH_SIZE = 10
 
 def seed_debug():
-    client = genai.Client(api_key=settings.GEMINI_API_KEY)
+    provider = get_embedding_provider()
 
     texts = [item["content"] for item in COACHING_KNOWLEDGE]
     print(f"[Seed] Embedding {len(texts)} tips...")
@@ -27,12 +26,7 @@ def seed_debug():
     for i in range(0, len(texts), BATCH_SIZE):
         chunk = texts[i : i + BATCH_SIZE]
         print(f"  Batch {i // BATCH_SIZE + 1} ({len(chunk)} tips)...")
-        result = client.models.embed_content(
-            model=EMBEDDING_MODEL,
-            contents=chunk,
-            config=types.EmbedContentConfig(task_type="RETRIEVAL_DOCUMENT"),
-        )
-        embeddings.extend([e.values for e in result.embeddings])
+        embeddings.extend(provider.embed(chunk, "RETRIEVAL_DOCUMENT"))
         if i + BATCH_SIZE < len(texts):
             time.sleep(15)
 
@@ -54,6 +48,8 @@ def seed_debug():
                     map_name=item["map"],
                     category=item["category"],
                     embedding=embeddings[i],
+                    content_hash=content_hash(item["content"]),
+                    embedding_model=embedding_model_tag(),
                 )
                 db.add(tip)
                 db.flush()  # force insert now
@@ -66,6 +62,7 @@ def seed_debug():
                 return
 
         db.commit()
+        bump_version()
         count = len(db.exec(select(CoachingTip)).all())
         print(f"[Seed] Inserted {count} tips. Done!")
 
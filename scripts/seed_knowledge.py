@@ -1,6 +1,17 @@
 """
-Incremental Seed Knowledge Base — embeds coaching tips one by one and inserts them.
-This approach handles strict rate limits by committing progress and allows for resuming.
+Incremental Seed Knowledge Base — syncs the coachingtip table with COACHING_KNOWLEDGE.
+
+- The table is diffed against COACHING_KNOWLEDGE by content hash (md5) and
+  embedding model tag, without reading any vectors: new tips and tips embedded
+  with another model/dimension are embedded, tips whose agent/map/category
+  changed are updated in place, and tips no longer in the list are deleted.
+  An interrupted run resumes exactly where it stopped.
+- Embedding requests carry the provider's max batch size of tips each, and
+  up to MAX_CONCURRENT_BATCHES run at once under an adaptive limiter: every
+  clean batch opens one more slot, a 429 halves the slots and pauses new
+  requests with exponential backoff.
+- Each embedded batch is COPYed into a temp table and upserted on
+  content_hash in one transaction; that commit is the checkpoint.
 
 Usage:
     docker-compose exec backend python scripts/seed_knowledge.py
@@ -8,90 +19,211 @@ Usage:
 
 import sys
 import os
-import time
-import hashlib
+import asyncio
+import csv
+import io
 
 # Add the backend root to the path so imports work
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from google import genai
-from google.genai import types
+from core import database
+database.engine.echo = False  # Quiet SQL logs
+
+from sqlalchemy import bindparam, delete, update
 from sqlmodel import Session, select
-from core.config import settings
 from core.database import engine
 from models.coaching_tip import CoachingTip
+from services.embeddings import get_embedding_provider
+from services.knowledge_base import content_hash, embedding_model_tag
+from services.vector_index import bump_version
 from services.coaching_knowledge import COACHING_KNOWLEDGE
 
-EMBEDDING_MODEL = "gemini-embedding-001"
-
-
-def get_content_hash(content: str) -> str:
-    return hashlib.md5(content.encode('utf-8')).hexdigest()
+MAX_CONCURRENT_BATCHES = 4
+MAX_ATTEMPTS = 8
+BASE_BACKOFF = 5.0
+MAX_BACKOFF = 120.0
+
+
+def _is_rate_limit(e: Exception) -> bool:
+    return "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e)
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for embedding requests."""
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self.backoff = BASE_BACKOFF
+        self.paused_until = 0.0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        delay = self.paused_until - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def succeeded(self):
+        self.limit = min(self.limit + 1, self.max_concurrency)
+        self.backoff = BASE_BACKOFF
+
+    def throttled(self):
+        self.limit = max(self.limit // 2, 1)
+        self.paused_until = asyncio.get_running_loop().time() + self.backoff
+        print(f"    Rate limit hit. {self.limit} concurrent batch(es), pausing {self.backoff:.0f}s...")
+        self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+
+
+_COLUMNS = "content, agent, map_name, category, embedding, content_hash, embedding_model"
+
+
+def copy_tips(items: list[dict], embeddings: list[list[float]]):
+    """Bulk upsert one batch (COPY into a temp table), committed as a single checkpoint."""
+    tag = embedding_model_tag()
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for item, embedding in zip(items, embeddings):
+        vector = "[" + ",".join(str(x) for x in embedding) + "]"
+        writer.writerow([
+            item["content"], item["agent"], item["map"], item["category"],
+            vector, content_hash(item["content"]), tag,
+        ])
+    buf.seek(0)
+
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"CREATE TEMP TABLE coachingtip_stage ON COMMIT DROP AS "
+                f"SELECT {_COLUMNS} FROM coachingtip WITH NO DATA"
+            )
+            cur.copy_expert(f"COPY coachingtip_stage ({_COLUMNS}) FROM STDIN WITH (FORMAT csv)", buf)
+            cur.execute(
+                f"INSERT INTO coachingtip ({_COLUMNS}) SELECT {_COLUMNS} FROM coachingtip_stage "
+                "ON CONFLICT (content_hash) DO UPDATE SET "
+                "agent = EXCLUDED.agent, map_name = EXCLUDED.map_name, category = EXCLUDED.category, "
+                "embedding = EXCLUDED.embedding, embedding_model = EXCLUDED.embedding_model"
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def sync_plan(db: Session) -> tuple[list[dict], list[dict], list[str], int]:
+    """
+    Diff COACHING_KNOWLEDGE against stored hashes/tags (no vectors read).
+    Returns (to_embed, to_update, to_delete, unchanged).
+    """
+    tag = embedding_model_tag()
+    stored = {
+        row.content_hash: row
+        for row in db.exec(
+            select(CoachingTip.content_hash, CoachingTip.embedding_model,
+                   CoachingTip.agent, CoachingTip.map_name, CoachingTip.category)
+        ).all()
+    }
+    desired = {}
+    for item in COACHING_KNOWLEDGE:
+        desired.setdefault(content_hash(item["content"]), item)
+
+    to_embed, to_update, unchanged = [], [], 0
+    for h, item in desired.items():
+        row = stored.get(h)
+        if row is None or row.embedding_model != tag:
+            to_embed.append(item)
+        elif (row.agent, row.map_name, row.category) != (item["agent"], item["map"], item["category"]):
+            to_update.append(item)
+        else:
+            unchanged += 1
+    to_delete = [h for h in stored if h not in desired]
+    return to_embed, to_update, to_delete, unchanged
+
+
+def apply_metadata_changes(db: Session, to_update: list[dict], to_delete: list[str]):
+    tip = CoachingTip.__table__
+    if to_update:
+        stmt = (
+            update(tip)
+            .where(tip.c.content_hash == bindparam("hash"))
+            .values(agent=bindparam("agent"), map_name=bindparam("map"), category=bindparam("category"))
+        )
+        db.connection().execute(stmt, [
+            {"hash": content_hash(item["content"]), "agent": item["agent"],
+             "map": item["map"], "category": item["category"]}
+            for item in to_update
+        ])
+    if to_delete:
+        db.exec(delete(CoachingTip).where(CoachingTip.content_hash.in_(to_delete)))
+    db.commit()
+
+
+async def embed_batch(provider, limiter: AdaptiveLimiter, items: list[dict]) -> list[list[float]] | None:
+    for _ in range(MAX_ATTEMPTS):
+        async with limiter:
+            try:
+                embeddings = await provider.aembed([item["content"] for item in items], "RETRIEVAL_DOCUMENT")
+            except Exception as e:
+                if not _is_rate_limit(e):
+                    print(f"    Unexpected error: {e}")
+                    raise
+                limiter.throttled()
+                continue
+            limiter.succeeded()
+            return embeddings
+    return None
 
 
-def seed():
-    client = genai.Client(api_key=settings.GEMINI_API_KEY)
-
-    print(f"[Seed] Processing {len(COACHING_KNOWLEDGE)} coaching tips...")
+async def seed_async() -> int:
+    provider = get_embedding_provider()
 
     with Session(engine) as db:
-        # Load existing tips to skip them
-        existing_tips = db.exec(select(CoachingTip)).all()
-        existing_content = {tip.content for tip in existing_tips}
-        print(f"[Seed] Found {len(existing_content)} tips already in DB.")
-
-        newly_inserted = 0
-        skipped = 0
-
-        for i, item in enumerate(COACHING_KNOWLEDGE):
-            content = item["content"]
-            
-            if content in existing_content:
-                skipped += 1
-                continue
+        pending, to_update, to_delete, unchanged = sync_plan(db)
+        print(f"[Seed] {unchanged} unchanged, {len(pending)} to embed, "
+              f"{len(to_update)} to update, {len(to_delete)} to delete.")
+        apply_metadata_changes(db, to_update, to_delete)
+    changed = len(to_update) + len(to_delete)
+
+    size = provider.max_batch_size
+    batches = [pending[i : i + size] for i in range(0, len(pending), size)]
+    print(f"[Seed] Embedding {len(pending)} new tips in {len(batches)} batch(es)...")
+
+    limiter = AdaptiveLimiter(MAX_CONCURRENT_BATCHES)
+    inserted = 0
+
+    async def run(n: int, items: list[dict]):
+        nonlocal inserted
+        embeddings = await embed_batch(provider, limiter, items)
+        if embeddings is None:
+            print(f"    Batch {n} still rate limited after {MAX_ATTEMPTS} attempts; re-run to resume.")
+            return
+        await asyncio.to_thread(copy_tips, items, embeddings)
+        inserted += len(items)
+        print(f"  Batch {n}/{len(batches)} stored ({inserted}/{len(pending)}).")
+
+    results = await asyncio.gather(
+        *(run(n, items) for n, items in enumerate(batches, start=1)), return_exceptions=True
+    )
+    # Committed batches are live even if another one failed
+    if inserted or changed:
+        bump_version()
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    return inserted
 
-            print(f"[Seed] ({i+1}/{len(COACHING_KNOWLEDGE)}) Embedding new tip: {content[:50]}...")
-            
-            # Retry logic for a single tip
-            embedding = None
-            for attempt in range(5):
-                try:
-                    result = client.models.embed_content(
-                        model=EMBEDDING_MODEL,
-                        contents=content,
-                        config=types.EmbedContentConfig(task_type="RETRIEVAL_DOCUMENT"),
-                    )
-                    embedding = result.embeddings[0].values
-                    break
-                except Exception as e:
-                    if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-                        wait_time = (attempt + 1) * 30
-                        print(f"    Rate limit hit. Waiting {wait_time}s before retry...")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"    Unexpected error: {e}")
-                        raise e
-            
-            if embedding:
-                tip = CoachingTip(
-                    content=item["content"],
-                    agent=item["agent"],
-                    map_name=item["map"],
-                    category=item["category"],
-                    embedding=embedding,
-                )
-                db.add(tip)
-                db.commit() # Commit each one to save progress
-                existing_content.add(content)
-                newly_inserted += 1
-                
-                # Small delay to stay under limit
-                time.sleep(1) 
-            else:
-                print(f"    Failed to embed tip {i+1} after 5 attempts. Stopping for now.")
-                break
-
-        print(f"[Seed] Finished. Newly inserted: {newly_inserted}, Skipped: {skipped}, Total in DB: {len(existing_content)}")
+
+def seed():
+    embedded = asyncio.run(seed_async())
+    print(f"[Seed] Finished. Embedded: {embedded}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+"""
+Warm Query Embeddings — pre-embeds every search query a coaching report can make.
+
+Report queries are built by knowledge_base.weakness_query from a weakness
+type plus an optional agent or map, so the full set is small and known ahead
+of time. Embedding them once fills the Redis embedding cache and keeps
+Gemini embedding calls off the report path. Safe to re-run: cached queries
+are skipped.
+
+Usage:
+    docker-compose exec backend python scripts/warm_query_embeddings.py
+"""
+
+import sys
+import os
+
+# Add the backend root to the path so imports work
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlmodel import Session, select
+from assets.agent_icon import small_display_icon
+from core.database import engine
+from models.match import MatchParticipation
+from services.coaching_knowledge import COACHING_KNOWLEDGE
+from services.knowledge_base import embed_queries, weakness_query
+
+# Weakness types emitted by ai_service.find_weaknesses
+GENERAL_WEAKNESSES = ["low_kd", "low_headshot", "dying_too_much", "low_impact", "inconsistent", "slumping"]
+
+
+def all_queries() -> list[str]:
+    agents = set(small_display_icon) | {tip["agent"] for tip in COACHING_KNOWLEDGE}
+    maps = {tip["map"] for tip in COACHING_KNOWLEDGE}
+    with Session(engine) as db:
+        maps |= set(db.exec(select(MatchParticipation.map).distinct()).all())
+    agents.discard("all")
+    maps.discard("all")
+
+    weaknesses = [{"type": t} for t in GENERAL_WEAKNESSES]
+    weaknesses += [{"type": "weak_map", "map": m} for m in sorted(maps)]
+    weaknesses += [{"type": "weak_agent", "agent": a} for a in sorted(agents)]
+    return [weakness_query(w) for w in weaknesses]
+
+
+def warm():
+    queries = all_queries()
+    print(f"[Warm] Embedding {len(queries)} report queries...")
+    embed_queries(queries)
+    print("[Warm] Done. Query embedding cache is warm.")
+
+
+if __name__ == "__main__":
+    warm()
@@ -1,10 +1,11 @@
-import httpx
+from core.http_client import get_http_client
 from models.agent import Agent
 from sqlmodel import Session, select
 
 class AgentService:
+    url = "https://valorant-api.com/v1/agents"
+
     def __init__(self, db_session):
-        self.url = "https://valorant-api.com/v1/agents"
         agents_to_add = ([])  # adding agents now from the url as we didnt find in db earlier
     @staticmethod
     async def fetch_and_update_agents(db : Session):
@@ -16,18 +17,17 @@ class AgentService:
         else:
             print("Pantry empty. Going to grocery store (API)...")
             agents_to_add = []
-            async with httpx.AsyncClient(timeout=httpx.Timeout(10.0)) as client:
-                    response = await client.get(AgentService.url)
-                    data = response.json()
-                    for agent_json in data["data"]:
-                        new_agent = Agent(
-                            displayIcon=agent_json["displayIcon"],
-                            displayName=agent_json["displayName"],
-                            role=agent_json["role"]["displayName"],
-                            description=agent_json["description"],
-                        )
-                        db.add(new_agent)
-                        agents_to_add.append(new_agent)
+            response = await get_http_client().get(AgentService.url)
+            data = response.json()
+            for agent_json in data["data"]:
+                new_agent = Agent(
+                    displayIcon=agent_json["displayIcon"],
+                    displayName=agent_json["displayName"],
+                    role=agent_json["role"]["displayName"],
+                    description=agent_json["description"],
+                )
+                db.add(new_agent)
+                agents_to_add.append(new_agent)
 
                     # added
             db.commit()
@@ -3,27 +3,20 @@ AI Trainer Service - The "Analyst"
 Queries match data and identifies player weaknesses.
 """
 
-from collections import defaultdict
 import json
-import statistics
-from sqlmodel import Session, select, desc
-from google import genai
+from datetime import datetime
+from sqlmodel import select, desc
+from sqlmodel.ext.asyncio.session import AsyncSession
 from core.config import settings
+from core.database import async_engine
 from models.match import MatchParticipation
-from services.knowledge_base import search_knowledge
+from services.analytics import MatchFrame, aggregate_window, load_match_frame
+from services.knowledge_base import asearch_knowledge_batch, weakness_query
+from services.llm import get_llm, model_for_tier
+from services.player_stats_service import get_player_stats, summarize
 
-# Shared Gemini client
-_client = None
 
-def _get_client():
-    global _client
-    if _client is None:
-        _client = genai.Client(api_key=settings.GEMINI_API_KEY)
-    return _client
-
-
-
-def get_recent_matches(puuid: str, db: Session, limit: int = 20) -> list[MatchParticipation]:
+async def get_recent_matches(puuid: str, db: AsyncSession, limit: int = 20) -> list[MatchParticipation]:
     """Fetch the most recent N matches for a player."""
     statement = (
         select(MatchParticipation)
@@ -31,169 +24,85 @@ def get_recent_matches(puuid: str, db: Session, limit: int = 20) -> list[MatchPa
         .order_by(desc(MatchParticipation.start_time))
         .limit(limit)
     )
-    return db.exec(statement).all()
+    return (await db.exec(statement)).all()
+
+
+# The analyses below run on a columnar MatchFrame (services/analytics.py).
+# They accept either a list of MatchParticipation rows or a prebuilt frame,
+# so callers running several of them should build the frame once.
+
+def _frame(matches: list[MatchParticipation] | MatchFrame) -> MatchFrame:
+    return matches if isinstance(matches, MatchFrame) else MatchFrame.from_matches(matches)
+
+
+async def get_latest_match_id(puuid: str, db: AsyncSession) -> str | None:
+    """The player's newest match id (one index lookup on puuid, start_time)."""
+    statement = (
+        select(MatchParticipation.match_id)
+        .where(MatchParticipation.puuid == puuid)
+        .order_by(desc(MatchParticipation.start_time))
+        .limit(1)
+    )
+    return (await db.exec(statement)).first()
 
 
 # ─── 1. Core Performance Stats ───────────────────────────────────────────────
 
-def get_aggregate_stats(matches: list[MatchParticipation]) -> dict:
+def get_aggregate_stats(matches: list[MatchParticipation] | MatchFrame) -> dict:
     """Calculate overall averages across all provided matches."""
-    total = len(matches)
-    if total == 0:
-        return {}
-
-    avg_kd = sum(m.kills / max(m.deaths, 1) for m in matches) / total
-    avg_adr = sum(m.damage_dealt / m.rounds_played for m in matches) / total
-    avg_acs = sum(m.combat_score / m.rounds_played for m in matches) / total
-    avg_hs = sum(
-        m.headshots / max(m.headshots + m.othershots, 1) * 100
-        for m in matches
-    ) / total
-    deaths_per_round = sum(m.deaths / m.rounds_played for m in matches) / total
-    win_rate = sum(1 for m in matches if m.result == "win") / total
-
-    return {
-        "avg_kd": round(avg_kd, 2),
-        "avg_adr": round(avg_adr),
-        "avg_acs": round(avg_acs),
-        "avg_hs": round(avg_hs),
-        "deaths_per_round": round(deaths_per_round, 2),
-        "win_rate": round(win_rate, 2),
-        "total_matches": total,
-    }
+    return _frame(matches).aggregate_stats()
 
 
 # ─── 2. Map-Specific Win Rate ────────────────────────────────────────────────
 
-def get_map_stats(matches: list[MatchParticipation]) -> list[dict]:
+def get_map_stats(matches: list[MatchParticipation] | MatchFrame) -> list[dict]:
     """Group matches by map and compute per-map win rates."""
-    maps = defaultdict(list)
-    for m in matches:
-        maps[m.map].append(m)
-
-    map_stats = []
-    for map_name, games in maps.items():
-        if len(games) < 3:
-            continue
-
-        wins = sum(1 for g in games if g.result == "win")
-        avg_kd = sum(g.kills / max(g.deaths, 1) for g in games) / len(games)
-        avg_acs = sum(g.combat_score / g.rounds_played for g in games) / len(games)
-
-        map_stats.append({
-            "map": map_name,
-            "games": len(games),
-            "win_rate": round(wins / len(games), 2),
-            "avg_kd": round(avg_kd, 2),
-            "avg_acs": round(avg_acs),
-        })
-
-    return map_stats
+    return _frame(matches).map_stats()
 
 
 # ─── 3. Agent Performance ────────────────────────────────────────────────────
 
-def get_agent_stats(matches: list[MatchParticipation]) -> list[dict]:
+def get_agent_stats(matches: list[MatchParticipation] | MatchFrame) -> list[dict]:
     """Group matches by agent and compare performance."""
-    agents = defaultdict(list)
-    for m in matches:
-        agents[m.agent_name].append(m)
-
-    agent_stats = []
-    for agent, games in agents.items():
-        if len(games) < 2:
-            continue
-
-        wins = sum(1 for g in games if g.result == "win")
-        avg_kd = sum(g.kills / max(g.deaths, 1) for g in games) / len(games)
-        avg_acs = sum(g.combat_score / g.rounds_played for g in games) / len(games)
-
-        agent_stats.append({
-            "agent": agent,
-            "games": len(games),
-            "win_rate": round(wins / len(games), 2),
-            "avg_kd": round(avg_kd, 2),
-            "avg_acs": round(avg_acs),
-        })
-
-    return agent_stats
+    return _frame(matches).agent_stats()
 
 
 # ─── 4. Consistency Check ────────────────────────────────────────────────────
 
-def get_consistency(matches: list[MatchParticipation]) -> dict:
+def get_consistency(matches: list[MatchParticipation] | MatchFrame) -> dict:
     """Measure performance variance — high = inconsistent player."""
-    if len(matches) < 3:
-        return {"kd_std": 0, "acs_std": 0}
-
-    kd_values = [m.kills / max(m.deaths, 1) for m in matches]
-    acs_values = [m.combat_score / m.rounds_played for m in matches]
-
-    return {
-        "kd_std": round(statistics.stdev(kd_values), 2),
-        "acs_std": round(statistics.stdev(acs_values), 2),
-    }
+    return _frame(matches).consistency()
 
 
 # ─── 5. Impact Rating ────────────────────────────────────────────────────────
 
-def get_impact_stats(matches: list[MatchParticipation]) -> dict:
+def get_impact_stats(matches: list[MatchParticipation] | MatchFrame) -> dict:
     """How often does this player carry vs get carried?"""
-    total = len(matches)
-    if total == 0:
-        return {}
-
-    return {
-        "avg_position": round(sum(m.position for m in matches) / total, 1),
-        "top2_rate": round(sum(1 for m in matches if m.position <= 2) / total, 2),
-        "bottom2_rate": round(sum(1 for m in matches if m.position >= 9) / total, 2),
-        "mvp_count": sum(1 for m in matches if m.position == 1),
-    }
+    return _frame(matches).impact_stats()
 
 
 # ─── 6. Trend Detection ──────────────────────────────────────────────────────
 
-def get_trend(matches: list[MatchParticipation]) -> dict:
-    """Compare last 5 games vs previous 15 to detect improvement/slump."""
-    if len(matches) < 6:
-        return {"kd_trend": 0, "acs_trend": 0, "direction": "not_enough_data"}
-
-    recent = matches[:5]
-    older = matches[5:]
-
-    recent_kd = sum(m.kills / max(m.deaths, 1) for m in recent) / len(recent)
-    older_kd = sum(m.kills / max(m.deaths, 1) for m in older) / len(older)
-
-    recent_acs = sum(m.combat_score / m.rounds_played for m in recent) / len(recent)
-    older_acs = sum(m.combat_score / m.rounds_played for m in older) / len(older)
-
-    kd_diff = round(recent_kd - older_kd, 2)
-
-    return {
-        "kd_trend": kd_diff,
-        "acs_trend": round(recent_acs - older_acs),
-        "direction": "improving" if kd_diff > 0.1 else "slumping" if kd_diff < -0.1 else "stable",
-    }
+def get_trend(matches: list[MatchParticipation] | MatchFrame) -> dict:
+    """Compare the last TREND_RECENT_MATCHES games vs the older ones to detect improvement/slump."""
+    return _frame(matches).trend(recent=settings.TREND_RECENT_MATCHES)
 
 
 # ─── 7. THE FULL WEAKNESS DETECTOR ───────────────────────────────────────────
 
-def detect_weaknesses(puuid: str, db: Session) -> dict:
-    """
-    Main entry point. Fetches last 20 matches, runs all analyses,
-    and returns structured weakness data for the LLM to use.
-    """
-    matches = get_recent_matches(puuid, db, limit=20)
+def analyze_matches(matches: list[MatchParticipation] | MatchFrame) -> dict:
+    """Run every analysis over a list of matches (newest first)."""
+    return _frame(matches).analyze()
 
-    if len(matches) < 3:
-        return {"error": "Not enough matches to analyze (need at least 3)"}
 
-    stats = get_aggregate_stats(matches)
-    map_data = get_map_stats(matches)
-    agent_data = get_agent_stats(matches)
-    consistency = get_consistency(matches)
-    impact = get_impact_stats(matches)
-    trend = get_trend(matches)
+def find_weaknesses(analysis: dict) -> list[dict]:
+    """Turn analysis results into a severity-sorted list of weaknesses."""
+    stats = analysis["summary"]
+    map_data = analysis["maps"]
+    agent_data = analysis["agents"]
+    consistency = analysis["consistency"]
+    impact = analysis["impact"]
+    trend = analysis["trend"]
 
     # ── Identify weaknesses ──
     weaknesses = []
@@ -263,36 +172,71 @@ def detect_weaknesses(puuid: str, db: Session) -> dict:
         weaknesses.append({
             "type": "slumping",
             "severity": "medium",
-            "message": f"Your K/D dropped by {abs(trend['kd_trend'])} over your last 5 games — possible tilt.",
+            "message": f"Your K/D dropped by {abs(trend['kd_trend'])} over your last {settings.TREND_RECENT_MATCHES} games — possible tilt.",
         })
 
     # Sort by severity (high first)
     severity_order = {"high": 3, "medium": 2, "low": 1}
     weaknesses.sort(key=lambda w: severity_order[w["severity"]], reverse=True)
 
-    return {
-        "summary": stats,
-        "maps": map_data,
-        "agents": agent_data,
-        "consistency": consistency,
-        "impact": impact,
-        "trend": trend,
-        "weaknesses": weaknesses,
-    }
+    return weaknesses
+
+
+async def detect_weaknesses(
+    puuid: str,
+    db: AsyncSession,
+    limit: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    season: str | None = None,
+) -> dict:
+    """
+    Main entry point. Runs all analyses and returns structured weakness
+    data for the LLM to use.
+
+    Default window: the player's rolling stats over their last 20 matches
+    (maintained on ingest, one lookup); players ingested before
+    player_stats existed fall back to scanning rows. Custom windows —
+    last N, a date range, an act ("e9a3") — are aggregated in SQL.
+    """
+    if limit or since or until or season:
+        analysis = await aggregate_window(puuid, db, limit=limit, since=since, until=until, season=season)
+    else:
+        player_stats = await get_player_stats(puuid, db)
+        if player_stats is not None and player_stats.window_size == settings.PLAYER_STATS_WINDOW:
+            analysis = summarize(player_stats)
+        else:
+            frame = await load_match_frame(puuid, db, limit=settings.PLAYER_STATS_WINDOW)
+            analysis = analyze_matches(frame)
+
+    if analysis["summary"].get("total_matches", 0) < 3:
+        return {"error": "Not enough matches to analyze (need at least 3)"}
+
+    return {**analysis, "weaknesses": find_weaknesses(analysis)}
 
 
 # ─── 8. THE ORCHESTRATOR (Analyst + Librarian + Writer) ──────────────────────
 
-def generate_coaching_report_stream(puuid: str, db: Session):
+async def _find_tips(searches: list[dict]) -> list[dict]:
+    # The session only connects if the pgvector fallback needs it
+    async with AsyncSession(async_engine) as db:
+        results = await asearch_knowledge_batch(searches, db=db, top_k=2)
+    return [tip for tips in results for tip in tips]
+
+
+async def generate_coaching_report_stream(data: dict, on_complete=None, tier: str | None = None):
     """
     Orchestrates the full AI coaching process:
-    1. Analyst: Analyzes matches to find weaknesses
+    1. Analyst: Analyzes matches to find weaknesses (done by the caller,
+       see detect_weaknesses — `data` is its result)
     2. Librarian: Searches knowledge base for relevant tips
-    3. Writer: Streams a personalized coaching report using Gemini
-    """
-    # 1. Analyst: Get stats and weaknesses
-    data = detect_weaknesses(puuid, db)
+    3. Writer: Streams a personalized coaching report from the configured LLM
+       (services/llm.py), using the model for `tier`
 
+    An async generator that holds no DB session while the LLM streams.
+    `on_complete(text)` is awaited with the full report only if generation
+    finished without errors (used to cache it).
+    """
     if "error" in data:
         yield f"Error: {data['error']}\n"
         return
@@ -302,24 +246,12 @@ def generate_coaching_report_stream(puuid: str, db: Session):
 
     try:
         # 2. Librarian: Gather relevant coaching tips
-        # We'll search for tips related to the top 3 weaknesses
-        relevant_tips = []
-        seen_content = set()
-
-        for w in weaknesses[:3]:
-            # Formulate a search query from the weakness
-            query = f"tips for {w['type']} {w.get('agent', '')} {w.get('map', '')}"
-            
-            # Filter by agent/map if applicable
-            agent_filter = w.get("agent")
-            map_filter = w.get("map")
-
-            results = search_knowledge(query, db=db, top_k=2, agent_filter=agent_filter, map_filter=map_filter)
-            
-            for tip in results:
-                if tip["content"] not in seen_content:
-                    relevant_tips.append(tip)
-                    seen_content.add(tip["content"])
+        # One batched search for the top 3 weaknesses (tips already deduplicated)
+        searches = [
+            {"query": weakness_query(w), "agent": w.get("agent"), "map": w.get("map")}
+            for w in weaknesses[:3]
+        ]
+        relevant_tips = await _find_tips(searches)
 
         # 3. Writer: Construct Prompt
         prompt = f"""
@@ -347,15 +279,13 @@ def generate_coaching_report_stream(puuid: str, db: Session):
         """
 
         # 4. Stream Response
-        client = _get_client()
-        response = client.models.generate_content_stream(
-            model="gemini-2.5-flash",
-            contents=prompt,
-        )
-
-        for chunk in response:
-            if chunk.text:
-                yield chunk.text
+        parts = []
+        async for text in get_llm().astream(prompt, model=model_for_tier(tier)):
+            parts.append(text)
+            yield text
+
+        if on_complete is not None:
+            await on_complete("".join(parts))
 
     except Exception as e:
         error_msg = str(e)
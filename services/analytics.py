@@ -0,0 +1,363 @@
+"""
+Analytics Engine - columnar, NumPy-backed match statistics.
+
+A player's participations are loaded once into a MatchFrame (one array per
+column, newest match first). Per-match ratios (K/D, ACS, ADR, HS%,
+deaths/round) are computed in a single vectorized pass and every analysis
+— aggregates, map/agent group-bys, stdev, trend windows — reuses them, so
+season-long windows of thousands of matches cost a few array operations
+instead of Python loops over ORM objects.
+
+The methods return exactly the dicts services/ai_service.py exposes.
+
+For season-scale windows (hundreds of matches, a date range, an act) the
+rows do not leave Postgres at all: aggregate_window computes the same dicts
+with one GROUPING SETS query.
+"""
+
+from datetime import datetime, timezone
+import numpy as np
+from sqlalchemy import DateTime, Float, case, cast, func, literal, or_, tuple_
+from sqlmodel import select, desc
+from sqlmodel.ext.asyncio.session import AsyncSession
+from core.config import settings
+from models.match import Match, MatchParticipation
+
+# Columns the analyses need (everything else on MatchParticipation is skipped)
+COLUMNS = (
+    "kills", "deaths", "combat_score", "damage_dealt", "rounds_played",
+    "headshots", "othershots", "position", "result", "map", "agent_name",
+)
+
+
+class MatchFrame:
+    def __init__(self, columns: dict):
+        self.size = len(columns["kills"])
+
+        kills = np.asarray(columns["kills"], dtype=np.float64)
+        deaths = np.asarray(columns["deaths"], dtype=np.float64)
+        rounds = np.maximum(np.asarray(columns["rounds_played"], dtype=np.float64), 1)
+        headshots = np.asarray(columns["headshots"], dtype=np.float64)
+        othershots = np.asarray(columns["othershots"], dtype=np.float64)
+
+        self.kd = kills / np.maximum(deaths, 1)
+        self.acs = np.asarray(columns["combat_score"], dtype=np.float64) / rounds
+        self.adr = np.asarray(columns["damage_dealt"], dtype=np.float64) / rounds
+        self.hs = headshots / np.maximum(headshots + othershots, 1) * 100
+        self.dpr = deaths / rounds
+        self.win = np.asarray(columns["result"], dtype=object) == "win"
+        self.position = np.asarray(columns["position"], dtype=np.int64)
+        self.map = np.asarray(columns["map"], dtype=object)
+        self.agent = np.asarray(columns["agent_name"], dtype=object)
+
+    @classmethod
+    def from_matches(cls, matches: list) -> "MatchFrame":
+        """Build from ORM objects (or anything with the COLUMNS attributes)."""
+        return cls({c: [getattr(m, c) for m in matches] for c in COLUMNS})
+
+    @classmethod
+    def from_rows(cls, rows: list) -> "MatchFrame":
+        """Build from result rows selected in COLUMNS order."""
+        transposed = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+        return cls(dict(zip(COLUMNS, transposed)))
+
+    def __len__(self):
+        return self.size
+
+    # ─── Analyses ─────────────────────────────────────────────────────────────
+
+    def aggregate_stats(self) -> dict:
+        if self.size == 0:
+            return {}
+        return {
+            "avg_kd": round(float(self.kd.mean()), 2),
+            "avg_adr": round(float(self.adr.mean())),
+            "avg_acs": round(float(self.acs.mean())),
+            "avg_hs": round(float(self.hs.mean())),
+            "deaths_per_round": round(float(self.dpr.mean()), 2),
+            "win_rate": round(float(self.win.mean()), 2),
+            "total_matches": self.size,
+        }
+
+    def _group_stats(self, keys: np.ndarray, label: str, min_games: int) -> list[dict]:
+        if self.size == 0:
+            return []
+        names, first_seen, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        games = np.bincount(inverse)
+        wins = np.bincount(inverse, weights=self.win)
+        sum_kd = np.bincount(inverse, weights=self.kd)
+        sum_acs = np.bincount(inverse, weights=self.acs)
+
+        grouped = []
+        # Most recently played first, like iterating the matches newest-first
+        for g in np.argsort(first_seen, kind="stable"):
+            if games[g] < min_games:
+                continue
+            grouped.append({
+                label: names[g],
+                "games": int(games[g]),
+                "win_rate": round(float(wins[g] / games[g]), 2),
+                "avg_kd": round(float(sum_kd[g] / games[g]), 2),
+                "avg_acs": round(float(sum_acs[g] / games[g])),
+            })
+        return grouped
+
+    def map_stats(self) -> list[dict]:
+        return self._group_stats(self.map, "map", min_games=3)
+
+    def agent_stats(self) -> list[dict]:
+        return self._group_stats(self.agent, "agent", min_games=2)
+
+    def consistency(self) -> dict:
+        if self.size < 3:
+            return {"kd_std": 0, "acs_std": 0}
+        return {
+            "kd_std": round(float(self.kd.std(ddof=1)), 2),
+            "acs_std": round(float(self.acs.std(ddof=1)), 2),
+        }
+
+    def impact_stats(self) -> dict:
+        if self.size == 0:
+            return {}
+        return {
+            "avg_position": round(float(self.position.mean()), 1),
+            "top2_rate": round(float((self.position <= 2).mean()), 2),
+            "bottom2_rate": round(float((self.position >= 9).mean()), 2),
+            "mvp_count": int((self.position == 1).sum()),
+        }
+
+    def trend(self, recent: int | None = None) -> dict:
+        recent = recent or settings.TREND_RECENT_MATCHES
+        if self.size < recent + 1:
+            return {"kd_trend": 0, "acs_trend": 0, "direction": "not_enough_data"}
+
+        kd_diff = round(float(self.kd[:recent].mean() - self.kd[recent:].mean()), 2)
+        acs_diff = float(self.acs[:recent].mean() - self.acs[recent:].mean())
+        return {
+            "kd_trend": kd_diff,
+            "acs_trend": round(acs_diff),
+            "direction": "improving" if kd_diff > 0.1 else "slumping" if kd_diff < -0.1 else "stable",
+        }
+
+    def analyze(self) -> dict:
+        return {
+            "summary": self.aggregate_stats(),
+            "maps": self.map_stats(),
+            "agents": self.agent_stats(),
+            "consistency": self.consistency(),
+            "impact": self.impact_stats(),
+            "trend": self.trend(),
+        }
+
+
+async def load_match_frame(puuid: str, db: AsyncSession, limit: int = 20) -> MatchFrame:
+    """Load a player's most recent N matches straight into columns (no ORM objects)."""
+    statement = (
+        select(*(getattr(MatchParticipation, c) for c in COLUMNS))
+        .where(MatchParticipation.puuid == puuid)
+        .order_by(desc(MatchParticipation.start_time))
+        .limit(limit)
+    )
+    return MatchFrame.from_rows((await db.exec(statement)).all())
+
+
+# ─── Server-side aggregation for custom windows ──────────────────────────────
+
+def _naive_utc(value: datetime):
+    """
+    start_time is a `timestamp without time zone` holding UTC, but query
+    params may carry an offset ("...Z"): bind them as naive UTC, with a plain
+    DateTime so the column type's own conversion does not re-add the offset.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return literal(value, DateTime())
+
+
+def _window_query(
+    puuid: str,
+    limit: int | None,
+    since: datetime | None,
+    until: datetime | None,
+    season: str | None,
+    recent: int,
+):
+    mp = MatchParticipation.__table__
+    rounds = cast(func.greatest(mp.c.rounds_played, 1), Float)
+
+    # 1. Per-match values for the selected window, newest first (rn = 1)
+    base = select(
+        mp.c.map.label("map"),
+        mp.c.agent_name.label("agent"),
+        mp.c.position.label("position"),
+        case((mp.c.result == "win", 1), else_=0).label("win"),
+        (cast(mp.c.kills, Float) / cast(func.greatest(mp.c.deaths, 1), Float)).label("kd"),
+        (cast(mp.c.combat_score, Float) / rounds).label("acs"),
+        (cast(mp.c.damage_dealt, Float) / rounds).label("adr"),
+        (cast(mp.c.headshots, Float) / cast(func.greatest(mp.c.headshots + mp.c.othershots, 1), Float) * 100).label("hs"),
+        (cast(mp.c.deaths, Float) / rounds).label("dpr"),
+        func.row_number().over(order_by=desc(mp.c.start_time)).label("rn"),
+    ).where(mp.c.puuid == puuid)
+    if season:
+        m = Match.__table__
+        base = base.join(m, m.c.id == mp.c.match_id).where(m.c.season == season)
+    if since:
+        base = base.where(mp.c.start_time >= _naive_utc(since))
+    if until:
+        base = base.where(mp.c.start_time < _naive_utc(until))
+    base = base.order_by(desc(mp.c.start_time)).limit(limit).subquery()
+
+    # 2. Rolling K/D over `recent` consecutive games (chronological frame)
+    rolling = dict(order_by=desc(base.c.rn), rows=(-(recent - 1), 0))
+    b = select(
+        base,
+        func.avg(base.c.kd).over(**rolling).label("rolling_kd"),
+        func.count().over(**rolling).label("span"),
+    ).subquery()
+
+    # 3. One pass: overall row + one row per map + one row per agent
+    return select(
+        func.grouping(b.c.map).label("g_map"),
+        func.grouping(b.c.agent).label("g_agent"),
+        b.c.map,
+        b.c.agent,
+        func.count().label("games"),
+        func.min(b.c.rn).label("first_seen"),
+        func.avg(b.c.win).label("win_rate"),
+        func.avg(b.c.kd).label("avg_kd"),
+        func.avg(b.c.acs).label("avg_acs"),
+        func.avg(b.c.adr).label("avg_adr"),
+        func.avg(b.c.hs).label("avg_hs"),
+        func.avg(b.c.dpr).label("dpr"),
+        func.stddev_samp(b.c.kd).label("kd_std"),
+        func.stddev_samp(b.c.acs).label("acs_std"),
+        func.avg(b.c.position).label("avg_position"),
+        func.avg(case((b.c.position <= 2, 1), else_=0)).label("top2_rate"),
+        func.avg(case((b.c.position >= 9, 1), else_=0)).label("bottom2_rate"),
+        func.sum(case((b.c.position == 1, 1), else_=0)).label("mvp_count"),
+        func.avg(b.c.kd).filter(b.c.rn <= recent).label("recent_kd"),
+        func.avg(b.c.kd).filter(b.c.rn > recent).label("older_kd"),
+        func.avg(b.c.acs).filter(b.c.rn <= recent).label("recent_acs"),
+        func.avg(b.c.acs).filter(b.c.rn > recent).label("older_acs"),
+        func.max(b.c.rolling_kd).filter(b.c.span == recent).label("kd_peak"),
+        func.min(b.c.rolling_kd).filter(b.c.span == recent).label("kd_low"),
+    ).group_by(func.grouping_sets(tuple_(), tuple_(b.c.map), tuple_(b.c.agent)))
+
+
+async def _unclassified_matches(puuid: str, season: str, db: AsyncSession) -> int:
+    """
+    The player's matches with no stored season that may belong to `season`:
+    inside the act's known date span, or anywhere if the act has no
+    classified matches at all. A season window silently leaves these out.
+    """
+    mp, m = MatchParticipation.__table__, Match.__table__
+    known = m.alias("known")
+    lo = select(func.min(known.c.start_time)).where(known.c.season == season).scalar_subquery()
+    hi = select(func.max(known.c.start_time)).where(known.c.season == season).scalar_subquery()
+    statement = (
+        select(func.count())
+        .select_from(mp.join(m, m.c.id == mp.c.match_id))
+        .where(mp.c.puuid == puuid, m.c.season.is_(None))
+        .where(or_(lo.is_(None), m.c.start_time.between(lo, hi)))
+    )
+    return (await db.exec(statement)).one()
+
+
+async def aggregate_window(
+    puuid: str,
+    db: AsyncSession,
+    limit: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    season: str | None = None,
+) -> dict:
+    """
+    Analyze an arbitrary window (last N, date range, act/episode) in SQL.
+    Returns the same dicts as MatchFrame.analyze(); only a few KB of
+    aggregates come back over the wire, however many matches are covered.
+    Season windows also report "unclassified_matches" when some of the
+    player's matches may be missing from them (stored without a season).
+    """
+    analysis = await _aggregate(puuid, db, limit, since, until, season)
+    if season:
+        unclassified = await _unclassified_matches(puuid, season, db)
+        if unclassified:
+            analysis["unclassified_matches"] = unclassified
+    return analysis
+
+
+async def _aggregate(
+    puuid: str,
+    db: AsyncSession,
+    limit: int | None,
+    since: datetime | None,
+    until: datetime | None,
+    season: str | None,
+) -> dict:
+    recent = settings.TREND_RECENT_MATCHES
+    limit = min(limit or settings.ANALYSIS_MAX_MATCHES, settings.ANALYSIS_MAX_MATCHES)
+    statement = _window_query(puuid, limit, since, until, season, recent)
+    rows = (await db.exec(statement)).mappings().all()
+
+    total = next((r for r in rows if r["g_map"] and r["g_agent"]), None)
+    if total is None or not total["games"]:
+        return MatchFrame.from_rows([]).analyze()
+    n = total["games"]
+
+    def group_stats(label: str, min_games: int) -> list[dict]:
+        grouped = sorted(
+            (r for r in rows if r[f"g_{label}"] == 0 and r["games"] >= min_games),
+            key=lambda r: r["first_seen"],
+        )
+        return [
+            {
+                label: r[label],
+                "games": r["games"],
+                "win_rate": round(float(r["win_rate"]), 2),
+                "avg_kd": round(float(r["avg_kd"]), 2),
+                "avg_acs": round(float(r["avg_acs"])),
+            }
+            for r in grouped
+        ]
+
+    if n < recent + 1:
+        trend = {"kd_trend": 0, "acs_trend": 0, "direction": "not_enough_data"}
+    else:
+        kd_diff = round(float(total["recent_kd"] - total["older_kd"]), 2)
+        trend = {
+            "kd_trend": kd_diff,
+            "acs_trend": round(float(total["recent_acs"] - total["older_acs"])),
+            "direction": "improving" if kd_diff > 0.1 else "slumping" if kd_diff < -0.1 else "stable",
+            # Best / worst stretch of `recent` consecutive games in the window
+            "kd_peak": round(float(total["kd_peak"]), 2),
+            "kd_low": round(float(total["kd_low"]), 2),
+        }
+
+    return {
+        "summary": {
+            "avg_kd": round(float(total["avg_kd"]), 2),
+            "avg_adr": round(float(total["avg_adr"])),
+            "avg_acs": round(float(total["avg_acs"])),
+            "avg_hs": round(float(total["avg_hs"])),
+            "deaths_per_round": round(float(total["dpr"]), 2),
+            "win_rate": round(float(total["win_rate"]), 2),
+            "total_matches": n,
+        },
+        "maps": group_stats("map", 3),
+        "agents": group_stats("agent", 2),
+        "consistency": (
+            {"kd_std": 0, "acs_std": 0}
+            if n < 3
+            else {
+                "kd_std": round(float(total["kd_std"]), 2),
+                "acs_std": round(float(total["acs_std"]), 2),
+            }
+        ),
+        "impact": {
+            "avg_position": round(float(total["avg_position"]), 1),
+            "top2_rate": round(float(total["top2_rate"]), 2),
+            "bottom2_rate": round(float(total["bottom2_rate"]), 2),
+            "mvp_count": int(total["mvp_count"]),
+        },
+        "trend": trend,
+    }
@@ -0,0 +1,114 @@
+"""
+Embeddings - The "Encoder"
+One interface for turning text into unit-length vectors of settings.EMBEDDING_DIM.
+
+- GeminiEmbeddings: gemini-embedding-001, Matryoshka-truncated to the
+  configured dimension and re-normalized.
+- HashingEmbeddings: local and deterministic. Words and word bigrams are
+  hashed into the configured dimension (signed hashing trick, sublinear tf),
+  so similar wording lands on similar vectors. No network, for CI, load
+  tests and benchmarks on isolated machines.
+
+Selected with settings.EMBEDDING_PROVIDER ("gemini" or "local"). Each
+provider's `tag` is stored with every tip, so switching providers makes the
+seed script re-embed the table.
+"""
+
+import hashlib
+import math
+import re
+from collections import Counter
+import numpy as np
+from google import genai
+from google.genai import types
+from core.config import settings
+
+EMBEDDING_MODEL = "gemini-embedding-001"
+
+
+def normalize(values) -> list[float]:
+    """Scale a vector to unit length (needed after Matryoshka truncation)."""
+    vec = np.asarray(values, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return (vec / norm).tolist() if norm else vec.tolist()
+
+
+class GeminiEmbeddings:
+    name = EMBEDDING_MODEL
+    # Max texts per embed_content call
+    max_batch_size = 100
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.tag = f"{self.name}@{dim}"
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        return self._client
+
+    def _config(self, task_type: str) -> types.EmbedContentConfig:
+        return types.EmbedContentConfig(task_type=task_type, output_dimensionality=self.dim)
+
+    def embed(self, texts: list[str], task_type: str) -> list[list[float]]:
+        result = self.client.models.embed_content(
+            model=EMBEDDING_MODEL, contents=texts, config=self._config(task_type)
+        )
+        return [normalize(e.values) for e in result.embeddings]
+
+    async def aembed(self, texts: list[str], task_type: str) -> list[list[float]]:
+        result = await self.client.aio.models.embed_content(
+            model=EMBEDDING_MODEL, contents=texts, config=self._config(task_type)
+        )
+        return [normalize(e.values) for e in result.embeddings]
+
+
+class HashingEmbeddings:
+    name = "local-hashing"
+    max_batch_size = 1000
+
+    _TOKEN = re.compile(r"[a-z0-9']+")
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.tag = f"{self.name}@{dim}"
+
+    def _features(self, text: str) -> Counter:
+        words = self._TOKEN.findall(text.lower())
+        return Counter(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+    def _vector(self, text: str) -> list[float]:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for feature, tf in self._features(text).items():
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            h = int.from_bytes(digest, "little")
+            sign = 1.0 if h >> 63 else -1.0
+            vec[h % self.dim] += sign * (1.0 + math.log(tf))
+        return normalize(vec)
+
+    def embed(self, texts: list[str], task_type: str) -> list[list[float]]:
+        return [self._vector(t) for t in texts]
+
+    async def aembed(self, texts: list[str], task_type: str) -> list[list[float]]:
+        return self.embed(texts, task_type)
+
+
+_PROVIDERS = {"gemini": GeminiEmbeddings, "local": HashingEmbeddings}
+_provider = None
+
+
+def get_embedding_provider():
+    """The configured provider (created once, reused)."""
+    global _provider
+    if _provider is None:
+        try:
+            cls = _PROVIDERS[settings.EMBEDDING_PROVIDER]
+        except KeyError:
+            raise ValueError(
+                f"Unknown EMBEDDING_PROVIDER {settings.EMBEDDING_PROVIDER!r} "
+                f"(expected one of {', '.join(_PROVIDERS)})"
+            )
+        _provider = cls(settings.EMBEDDING_DIM)
+    return _provider
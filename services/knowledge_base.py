@@ -3,39 +3,163 @@ Knowledge Base Service - The "Librarian"
 Searches coaching tips using pgvector cosine similarity in PostgreSQL.
 
 All embeddings live in the `coachingtip` table (seeded by scripts/seed_knowledge.py).
-At query time, we embed the search text with Gemini and let pgvector rank results.
+At query time, we embed the search text with the configured provider
+(services/embeddings.py: Gemini, or a local hashing encoder) and rank tips with the
+in-process NumPy index (services/vector_index.py). Past VECTOR_INDEX_MAX_TIPS,
+pgvector ranks them through the HNSW index (candidate list size:
+settings.VECTOR_EF_SEARCH).
+
+Query embeddings are cached by content hash: in-process LRU first, then
+Redis (`emb:<sha256>`, float32 bytes, no expiry). Report queries come from a
+small finite set (see weakness_query), and scripts/warm_query_embeddings.py
+pre-embeds all of them, so the hot path makes no embedding round-trips.
+
+The report path runs on the event loop (aembed_queries,
+asearch_knowledge_batch: async Gemini client, async Redis, AsyncSession).
 """
 
-from google import genai
-from google.genai import types
+import hashlib
+import numpy as np
+from redis.exceptions import RedisError
+from sqlalchemy import Integer, String, cast, column, func, lateral, literal, or_, true, values
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from pgvector.sqlalchemy import Vector
 from core.config import settings
+from core.lru import LRUCache
+from core.redis import get_async_redis, get_redis
 from models.coaching_tip import CoachingTip
+from services.embeddings import get_embedding_provider
+from services.vector_index import aget_index, get_index
 
 # ─── Config ───────────────────────────────────────────────────────────────────
 
-EMBEDDING_MODEL = "gemini-embedding-001"
+def content_hash(content: str) -> str:
+    """md5 of a tip's text; matches Postgres md5(content)."""
+    return hashlib.md5(content.encode("utf-8")).hexdigest()
+
+
+def embedding_model_tag() -> str:
+    """Stored with each tip; rows with a different tag are re-embedded."""
+    return get_embedding_provider().tag
+
+
+def _ef_search():
+    """Per-transaction HNSW recall/latency knob (SET LOCAL)."""
+    return select(func.set_config("hnsw.ef_search", str(settings.VECTOR_EF_SEARCH), True))
+
+
+def _set_ef_search(db: Session):
+    db.exec(_ef_search())
+
+
+_query_cache = LRUCache(maxsize=settings.EMBEDDING_CACHE_LRU_SIZE)
+
+
+def _cache_key(text: str) -> str:
+    digest = hashlib.sha256(f"{embedding_model_tag()}|RETRIEVAL_QUERY|{text}".encode()).hexdigest()
+    return f"emb:{digest}"
+
+
+def weakness_query(weakness: dict) -> str:
+    """The search text the report uses for one weakness (finite set → cacheable)."""
+    return f"tips for {weakness['type']} {weakness.get('agent', '')} {weakness.get('map', '')}"
+
+
+def _from_local(keys: list[str]) -> list:
+    return [_query_cache.get(k) for k in keys]
+
+
+def _fill_from_redis(keys: list[str], vectors: list, missing: list[int], stored: list):
+    for i, raw in zip(missing, stored):
+        if raw is not None:
+            vectors[i] = np.frombuffer(raw, dtype=np.float32).tolist()
+            _query_cache.set(keys[i], vectors[i])
+
+
+def _unique_missing(keys: list[str], vectors: list) -> list[int]:
+    return list({keys[i]: i for i, v in enumerate(vectors) if v is None}.values())
+
+
+def _batches(missing: list[int], size: int):
+    for start in range(0, len(missing), size):
+        yield missing[start : start + size]
+
+
+def _remember(keys: list[str], batch: list[int], embeddings, embedded: dict, fresh: dict):
+    for i, vec in zip(batch, embeddings):
+        embedded[keys[i]] = vec
+        _query_cache.set(keys[i], vec)
+        fresh[keys[i]] = np.asarray(vec, dtype=np.float32).tobytes()
+
+
+def embed_queries(texts: list[str]) -> list[list[float]]:
+    """
+    Embed query strings. Served from the LRU, then Redis; whatever is left
+    is embedded in batches by the configured provider and written back to
+    both tiers.
+    """
+    keys = [_cache_key(t) for t in texts]
+    vectors = _from_local(keys)
+
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        try:
+            stored = get_redis().mget([keys[i] for i in missing])
+        except RedisError as e:
+            print(f"[Librarian] Embedding cache read failed: {e}")
+            stored = [None] * len(missing)
+        _fill_from_redis(keys, vectors, missing, stored)
+
+    missing = _unique_missing(keys, vectors)
+    if missing:
+        provider = get_embedding_provider()
+        fresh, embedded = {}, {}
+        for batch in _batches(missing, provider.max_batch_size):
+            embeddings = provider.embed([texts[i] for i in batch], "RETRIEVAL_QUERY")
+            _remember(keys, batch, embeddings, embedded, fresh)
+        try:
+            get_redis().mset(fresh)
+        except RedisError as e:
+            print(f"[Librarian] Embedding cache write failed: {e}")
+        vectors = [v if v is not None else embedded[k] for k, v in zip(keys, vectors)]
+
+    return vectors
 
-# Shared Gemini client (created once, reused)
-_client = None
 
+async def aembed_queries(texts: list[str]) -> list[list[float]]:
+    """embed_queries for the event loop: async Redis and the provider's aembed."""
+    keys = [_cache_key(t) for t in texts]
+    vectors = _from_local(keys)
 
-def _get_client():
-    global _client
-    if _client is None:
-        _client = genai.Client(api_key=settings.GEMINI_API_KEY)
-    return _client
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        try:
+            stored = await get_async_redis().mget([keys[i] for i in missing])
+        except RedisError as e:
+            print(f"[Librarian] Embedding cache read failed: {e}")
+            stored = [None] * len(missing)
+        _fill_from_redis(keys, vectors, missing, stored)
+
+    missing = _unique_missing(keys, vectors)
+    if missing:
+        provider = get_embedding_provider()
+        fresh, embedded = {}, {}
+        for batch in _batches(missing, provider.max_batch_size):
+            embeddings = await provider.aembed([texts[i] for i in batch], "RETRIEVAL_QUERY")
+            _remember(keys, batch, embeddings, embedded, fresh)
+        try:
+            await get_async_redis().mset(fresh)
+        except RedisError as e:
+            print(f"[Librarian] Embedding cache write failed: {e}")
+        vectors = [v if v is not None else embedded[k] for k, v in zip(keys, vectors)]
+
+    return vectors
 
 
 def _embed_query(text: str) -> list[float]:
-    """Embed a single query string using Gemini."""
-    client = _get_client()
-    result = client.models.embed_content(
-        model=EMBEDDING_MODEL,
-        contents=text,
-        config=types.EmbedContentConfig(task_type="RETRIEVAL_QUERY"),
-    )
-    return result.embeddings[0].values
+    """Embed a single query string (cached)."""
+    return embed_queries([text])[0]
 
 
 # ─── Public API ───────────────────────────────────────────────────────────────
@@ -62,6 +186,10 @@ def search_knowledge(
     """
     query_vec = _embed_query(query)
 
+    index = get_index(db)
+    if index is not None:
+        return index.search(query_vec, top_k, agent_filter, map_filter)
+
     # Build the pgvector query — ORDER BY cosine distance (ascending = most similar first)
     stmt = select(
         CoachingTip,
@@ -76,6 +204,7 @@ def search_knowledge(
 
     stmt = stmt.order_by("distance").limit(top_k)
 
+    _set_ef_search(db)
     results = db.exec(stmt).all()
 
     return [
@@ -88,3 +217,107 @@ def search_knowledge(
         }
         for tip, distance in results
     ]
+
+
+def _batch_statement(searches: list[dict], vectors: list[list[float]], top_k: int):
+    """
+    The query vectors go in a VALUES list that is LATERAL-joined to a
+    per-query top-k scan with the same filters as search_knowledge. A tip
+    matched by several queries is returned once, for the earliest query
+    (DISTINCT ON content).
+    """
+    queries = values(
+        column("qid", Integer),
+        column("embedding", Vector()),
+        column("agent", String),
+        column("map_name", String),
+        name="queries",
+    ).data([
+        (i, vec, s.get("agent"), s.get("map"))
+        for i, (s, vec) in enumerate(zip(searches, vectors))
+    ])
+
+    tip = CoachingTip.__table__
+    hits = lateral(
+        select(
+            tip.c.content,
+            tip.c.agent,
+            tip.c.map_name,
+            tip.c.category,
+            tip.c.embedding.cosine_distance(cast(queries.c.embedding, Vector())).label("distance"),
+        )
+        .where(or_(queries.c.agent.is_(None), tip.c.agent.in_([queries.c.agent, literal("all")])))
+        .where(or_(queries.c.map_name.is_(None), tip.c.map_name.in_([queries.c.map_name, literal("all")])))
+        .order_by("distance")
+        .limit(top_k)
+    ).alias("hits")
+
+    deduped = (
+        select(queries.c.qid, hits)
+        .select_from(queries.join(hits, true()))
+        .distinct(hits.c.content)
+        .order_by(hits.c.content, queries.c.qid, hits.c.distance)
+        .subquery()
+    )
+    return select(*deduped.c).order_by(deduped.c.qid, deduped.c.distance)
+
+
+def _group_rows(rows, count: int) -> list[list[dict]]:
+    grouped = [[] for _ in range(count)]
+    for row in rows:
+        grouped[row["qid"]].append({
+            "content": row["content"],
+            "agent": row["agent"],
+            "map": row["map_name"],
+            "category": row["category"],
+            "score": round(1.0 - row["distance"], 4),
+        })
+    return grouped
+
+
+def search_knowledge_batch(
+    searches: list[dict],
+    db: Session,
+    top_k: int = 3,
+) -> list[list[dict]]:
+    """
+    Run several knowledge searches in two round-trips: one batched embed
+    call and one SQL statement (see _batch_statement).
+
+    Each search is {"query": str, "agent": str | None, "map": str | None}.
+
+    Returns:
+        One list of result dicts per search, in input order.
+    """
+    if not searches:
+        return []
+
+    vectors = embed_queries([s["query"] for s in searches])
+
+    index = get_index(db)
+    if index is not None:
+        return index.search_batch(searches, vectors, top_k)
+
+    _set_ef_search(db)
+    rows = db.exec(_batch_statement(searches, vectors, top_k)).mappings()
+    return _group_rows(rows, len(searches))
+
+
+async def asearch_knowledge_batch(
+    searches: list[dict],
+    db: AsyncSession,
+    top_k: int = 3,
+) -> list[list[dict]]:
+    """search_knowledge_batch on the event loop (async embeddings, Redis and DB)."""
+    if not searches:
+        return []
+
+    vectors = await aembed_queries([s["query"] for s in searches])
+
+    index = await aget_index()
+    if index is not None:
+        return index.search_batch(searches, vectors, top_k)
+
+    await db.exec(_ef_search())
+    rows = (await db.exec(_batch_statement(searches, vectors, top_k))).mappings()
+    return _group_rows(rows, len(searches))
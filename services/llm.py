@@ -0,0 +1,88 @@
+"""
+LLM - The "Writer" backend
+One interface for streaming report text, whichever model produces it.
+
+- GeminiLLM: Gemini streaming generation.
+- FakeLLM: local, no network. Streams a canned report word by word after
+  LLM_FAKE_FIRST_TOKEN_LATENCY seconds at LLM_FAKE_TOKENS_PER_SECOND, so
+  the report endpoint can be load-tested and our own latency measured
+  apart from the API's.
+
+Selected with settings.LLM_PROVIDER ("gemini" or "fake"). The model comes
+from settings.LLM_TIER_MODELS, so tiers can run on different models.
+"""
+
+import asyncio
+from google import genai
+from core.config import settings
+
+FAKE_REPORT = """## Your Coaching Report
+
+**Playstyle summary:** You take a lot of early fights and win enough of them to stay relevant, \
+but your deaths come in clusters that cost your team rounds.
+
+- **Crosshair placement:** keep your crosshair at head height while clearing angles. \
+Spend 10 minutes in the range before queueing, focusing on first-shot accuracy.
+- **Trading:** stay within trade distance of a teammate when you take contact, \
+and let utility go in before you swing.
+- **Consistency:** review one loss per session and note the first death of each lost round.
+
+Keep at it — small habits compound fast.
+"""
+
+
+def model_for_tier(tier: str | None = None) -> str:
+    """Model name for a report tier (falls back to LLM_DEFAULT_TIER)."""
+    return settings.LLM_TIER_MODELS.get(tier or settings.LLM_DEFAULT_TIER,
+                                        settings.LLM_TIER_MODELS[settings.LLM_DEFAULT_TIER])
+
+
+class GeminiLLM:
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        return self._client
+
+    async def astream(self, prompt: str, model: str):
+        async for chunk in await self.client.aio.models.generate_content_stream(model=model, contents=prompt):
+            if chunk.text:
+                yield chunk.text
+
+
+class FakeLLM:
+    def __init__(self, first_token_latency: float, tokens_per_second: float, text: str = FAKE_REPORT):
+        self.first_token_latency = first_token_latency
+        self.interval = 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+        self.tokens = text.split(" ")
+
+    def _chunks(self):
+        last = len(self.tokens) - 1
+        for i, token in enumerate(self.tokens):
+            yield token if i == last else token + " "
+
+    async def astream(self, prompt: str, model: str):
+        await asyncio.sleep(self.first_token_latency)
+        for i, token in enumerate(self._chunks()):
+            if i:
+                await asyncio.sleep(self.interval)
+            yield token
+
+
+_llm = None
+
+
+def get_llm():
+    """The configured LLM backend (created once, reused)."""
+    global _llm
+    if _llm is None:
+        if settings.LLM_PROVIDER == "gemini":
+            _llm = GeminiLLM()
+        elif settings.LLM_PROVIDER == "fake":
+            _llm = FakeLLM(settings.LLM_FAKE_FIRST_TOKEN_LATENCY, settings.LLM_FAKE_TOKENS_PER_SECOND)
+        else:
+            raise ValueError(f"Unknown LLM_PROVIDER {settings.LLM_PROVIDER!r} (expected 'gemini' or 'fake')")
+    return _llm
@@ -0,0 +1,87 @@
+"""
+Match History - the cached "last 20 matches" payload behind GET /matches/{region}/{puuid}.
+
+The endpoint (read-through) and the worker (write-through after ingestion)
+both build it here, so a history written by either is byte-identical.
+"""
+from typing import List
+from pydantic import TypeAdapter
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select, desc
+from sqlmodel.ext.asyncio.session import AsyncSession
+from core.config import settings
+from core.database import async_engine
+from core.response_cache import pack_entry
+from models.match import Match, MatchParticipation
+from schemas.match_schema import ParticipationBase
+
+HISTORY_LIMIT = 20
+
+_participations = TypeAdapter(List[ParticipationBase])
+
+
+def history_cache_key(puuid: str) -> str:
+    return f"player_matches_{puuid}"
+
+
+def serialize_history(matches: list[MatchParticipation]) -> bytes:
+    # Through the public schema (this also strips the cyclic
+    # Match -> Participation relationship)
+    return _participations.dump_json(_participations.validate_python(matches))
+
+
+async def build_history(puuid: str) -> bytes | None:
+    """Serialized history for one player, or None if they have no matches yet."""
+    # Own session: under stale-while-revalidate this runs after the response
+    async with AsyncSession(async_engine) as db:
+        statement = (
+            select(MatchParticipation)
+            .join(Match)
+            .where(MatchParticipation.puuid == puuid)
+            .order_by(desc(MatchParticipation.start_time))
+            .limit(HISTORY_LIMIT)
+        )
+        matches = (await db.exec(statement)).all()
+    return serialize_history(matches) if matches else None
+
+
+def write_histories(puuids, db: Session, redis_client) -> int:
+    """
+    Write fresh histories for every player in `puuids`: one windowed query
+    for all of them, one pipelined Redis round-trip for all the writes.
+    """
+    puuids = list(puuids)
+    if not puuids:
+        return 0
+
+    mp = MatchParticipation.__table__
+    ranked = (
+        select(
+            mp,
+            func.row_number().over(partition_by=mp.c.puuid, order_by=desc(mp.c.start_time)).label("rn"),
+        )
+        .join(Match.__table__, Match.__table__.c.id == mp.c.match_id)
+        .where(mp.c.puuid.in_(puuids))
+        .subquery()
+    )
+    participation = aliased(MatchParticipation, ranked)
+    statement = (
+        select(participation)
+        .where(ranked.c.rn <= HISTORY_LIMIT)
+        .order_by(ranked.c.puuid, ranked.c.rn)
+    )
+
+    histories = {}
+    for row in db.exec(statement).all():
+        histories.setdefault(row.puuid, []).append(row)
+
+    pipe = redis_client.pipeline(transaction=False)
+    for puuid, matches in histories.items():
+        pipe.set(
+            history_cache_key(puuid),
+            pack_entry(serialize_history(matches), settings.MATCHES_CACHE_TTL),
+            ex=settings.MATCHES_CACHE_TTL + settings.MATCHES_CACHE_STALE_TTL,
+        )
+    pipe.execute()
+    return len(histories)
@@ -1,10 +1,21 @@
-import httpx
+import asyncio
 from core.config import settings
+from core.http_client import get_http_client
+from core.rate_governor import upstream_governor, INTERACTIVE, BACKGROUND
 from fastapi import HTTPException
 from models.match import Match, MatchParticipation
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import literal_column, update
+from sqlalchemy.orm import contains_eager
+from sqlalchemy.dialects.postgresql import insert
 from datetime import datetime
 from assets.agent_icon import small_display_icon
+from services.player_stats_service import update_player_stats
+
+
+# HenrikDev returns at most 10 matches per v4 page
+PAGE_SIZE = 10
 
 
 class MatchService:
@@ -12,23 +23,110 @@ class MatchService:
         self.base_url = "https://api.henrikdev.xyz/valorant"
         self.headers = {"Authorization": settings.ACCESS_TOKEN, "Accept": "*/*"}
 
+    async def _get(self, url: str, priority: str):
+        await upstream_governor.acquire(priority)
+        response = await get_http_client().get(url, headers=self.headers)
+        if response.status_code == 200:
+            data = response.json()
+            return data["data"]
+        if response.status_code == 429:
+            await upstream_governor.drain()
+
+        error_msg = f"HenrikAPI Error: {response.status_code} - {response.text}"
+        print(error_msg)  # In ra terminal (phòng hờ)
+        raise HTTPException(status_code=response.status_code, detail=error_msg)
+
     async def get_matches_by_region_and_puuid(
-        self, region: str, puuid: str, start: int
+        self, region: str, puuid: str, start: int, priority: str = INTERACTIVE
     ):
         url = (
             self.base_url
-            + f"/v4/by-puuid/matches/{region}/pc/{puuid}?mode=competitive&size=10&start={start}"
+            + f"/v4/by-puuid/matches/{region}/pc/{puuid}?mode=competitive&size={PAGE_SIZE}&start={start}"
+        )
+        return await self._get(url, priority)
+
+    async def get_match_ids_by_region_and_puuid(
+        self, region: str, puuid: str, start: int, priority: str = INTERACTIVE
+    ) -> list[str]:
+        """Lightweight listing: just the match ids of one page, no full payloads."""
+        page = start // PAGE_SIZE + 1
+        url = (
+            self.base_url
+            + f"/v1/by-puuid/stored-matches/{region}/{puuid}?mode=competitive&size={PAGE_SIZE}&page={page}"
         )
-        async with httpx.AsyncClient(timeout=httpx.Timeout(10.0)) as client:
-            response = await client.get(url, headers=self.headers)
-            if response.status_code == 200:
-                data = response.json()
-                match_data = data["data"]
-                return match_data
+        data = await self._get(url, priority)
+        return [m["meta"]["id"] for m in data]
+
+    async def backfill_matches(
+        self,
+        region: str,
+        puuid: str,
+        db: Session,
+        pages: int | None = None,
+        concurrency: int | None = None,
+    ) -> dict:
+        """
+        Walk the player's history page by page (start=0, 10, 20, ...).
+
+        All pages are requested up front over the pooled client, at most
+        `concurrency` at a time, so a cold player costs roughly one
+        round-trip. Pages are still ingested in order, and as soon as
+        fetch_and_update_matches hits its "already linked" cutoff (or a page
+        comes back short) the remaining requests are cancelled. Page requests
+        draw from the upstream governor at BACKGROUND priority.
+
+        With MATCH_SYNC_BY_ID, pages are match-id listings and only matches
+        nobody has ingested yet are downloaded (see sync_match_ids). Players
+        with no stored participations at all skip the listing: every match
+        is unknown anyway, so full v4 pages cost the fewest calls.
+        """
+        pages = pages or settings.MATCH_BACKFILL_PAGES
+        semaphore = asyncio.Semaphore(concurrency or settings.MATCH_BACKFILL_CONCURRENCY)
+        by_id = settings.MATCH_SYNC_BY_ID and db.exec(
+            select(MatchParticipation.id).where(MatchParticipation.puuid == puuid).limit(1)
+        ).first() is not None
+
+        async def fetch_page(start: int):
+            async with semaphore:
+                if by_id:
+                    return await self.get_match_ids_by_region_and_puuid(
+                        region, puuid, start, priority=BACKGROUND
+                    )
+                return await self.get_matches_by_region_and_puuid(
+                    region, puuid, start, priority=BACKGROUND
+                )
+
+        starts = [page * PAGE_SIZE for page in range(pages)]
+        tasks = [asyncio.create_task(fetch_page(start)) for start in starts]
+        summary = {"pages": 0, "matches": 0, "new_matches": 0, "linked": 0, "affected_puuids": set()}
+        try:
+            for start, task in zip(starts, tasks):
+                match_data = await task
+                if not match_data:
+                    break
+
+                summary["pages"] += 1
+                summary["matches"] += len(match_data)
+                if by_id:
+                    result = await self.sync_match_ids(
+                        region, puuid, match_data, db, priority=BACKGROUND,
+                        start=start, semaphore=semaphore,
+                    )
+                else:
+                    result = self.fetch_and_update_matches(match_data, puuid, db)
+                summary["new_matches"] += result["new_matches"]
+                summary["linked"] += result["linked"]
+                summary["affected_puuids"] |= result["affected_puuids"]
+                if result["done"]:
+                    break
+                if len(match_data) < PAGE_SIZE:
+                    break  # Reached the end of the player's history
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
-            error_msg = f"HenrikAPI Error: {response.status_code} - {response.text}"
-            print(error_msg)  # In ra terminal (phòng hờ)
-            raise HTTPException(status_code=response.status_code, detail=error_msg)
+        return summary
 
     def update_player_link(self, match_id: str, puuid: str, db: Session):
         statement = select(MatchParticipation).where(
@@ -40,154 +138,239 @@ class MatchService:
             db.commit()
             db.refresh(participation_in_db)
 
-    def fetch_and_update_matches(self, match_data, puuid: str, db: Session):
-        # ── BATCHED LOOKUPS (N+1 Fix) ────────────────────────────────────────
-        # Instead of querying DB inside the loop (1 query per match = N+1),
-        # we pre-fetch ALL existing data in 2 queries, then check in-memory.
+    def _build_match_row(self, match_json) -> dict:
+        return {
+            "id": match_json["metadata"]["match_id"],
+            "map_name": match_json["metadata"]["map"]["name"],
+            "start_time": match_json["metadata"]["started_at"],
+            "start_time_patched": datetime.fromisoformat(match_json["metadata"]["started_at"]),
+            "duration_ms": match_json["metadata"]["game_length_in_ms"],
+            "winning_team": (
+                "Red" if match_json["teams"][0]["won"] else "Blue"
+            ),  # "Blue" or "Red"
+            "rounds_play": match_json["teams"][0]["rounds"]["won"] + match_json["teams"][0]["rounds"]["lost"],
+            "blue_team_score": match_json["teams"][1]["rounds"]["won"],
+            "red_team_score": match_json["teams"][0]["rounds"]["won"],
+            "season": (match_json["metadata"].get("season") or {}).get("short"),
+        }
 
-        # 1. Extract all match IDs from the API response
-        incoming_ids = [m["metadata"]["match_id"] for m in match_data]
+    def _build_participation_rows(self, match_row: dict, match_json, puuid: str) -> list[dict]:
+        blue, red = match_row["blue_team_score"], match_row["red_team_score"]
+
+        all_players_sorted = sorted(
+            match_json["players"], key=lambda x: x["stats"]["score"], reverse=True
+        )
+
+        rows = []
+        for rank, players in enumerate(all_players_sorted, start=1):
+            if blue == red:
+                tmpres = "draw"
+            elif blue > red and players["team_id"] == "Blue":
+                tmpres = "win"
+            elif blue < red and players["team_id"] == "Red":
+                tmpres = "win"
+            else:
+                tmpres = "lose"
 
-        # 2. ONE query: find which of these matches already exist in DB
-        existing_matches_stmt = select(Match).where(Match.id.in_(incoming_ids))
-        existing_matches = {m.id: m for m in db.exec(existing_matches_stmt).all()}
+            rows.append({
+                "match_id": match_row["id"],
+                "rounds_played": match_row["rounds_play"],
+                "start_time": match_row["start_time"],
+                "map": match_row["map_name"],
+                "user_id": players["name"],
+                "user_tag": players["tag"],
+                "puuid": players["puuid"],
+                "agent_name": players["agent"]["name"],
+                "agent_image": small_display_icon[players["agent"]["name"]],
+                "team_id": players["team_id"],
+                "current_rank": players["tier"]["name"],
+                "current_rank_image": f"/static/rank_png/{players['tier']['name']}.png" if players.get("tier", {}).get("name") else "",
+                "kills": players["stats"]["kills"],
+                "deaths": players["stats"]["deaths"],
+                "assists": players["stats"]["assists"],
+                "combat_score": players["stats"]["score"],
+                "headshots": players["stats"]["headshots"],
+                "othershots": players["stats"]["bodyshots"] + players["stats"]["legshots"],
+                "damage_dealt": players["stats"]["damage"]["dealt"],
+                "damage_taken": players["stats"]["damage"]["received"],
+                "roundsWon": blue if players["team_id"] == "Blue" else red,
+                "roundsLost": red if players["team_id"] == "Blue" else blue,
+                "result": tmpres,
+                "position": rank,
+                "linked_to_match": players["puuid"] == puuid,
+            })
+        return rows
 
-        # 3. ONE query: find which participations already exist for this player
-        existing_parts_stmt = select(MatchParticipation).where(
+    def _apply_link_cutoff(self, incoming_ids: list[str], puuid: str, db: Session):
+        """
+        Walk incoming ids newest-first and stop after 3 matches this player
+        is already linked to (safety cap). Returns (ids still to process,
+        whether the cutoff was hit). One query.
+        """
+        existing_parts_stmt = select(
+            MatchParticipation.match_id, MatchParticipation.linked_to_match
+        ).where(
             MatchParticipation.match_id.in_(incoming_ids),
             MatchParticipation.puuid == puuid,
         )
-        existing_parts = {
-            p.match_id: p for p in db.exec(existing_parts_stmt).all()
-        }
+        existing_parts = dict(db.exec(existing_parts_stmt).all())
 
-        # ── PROCESS LOOP (no DB queries inside!) ─────────────────────────────
         k = 3
-        new_matches_to_add = []
-        new_participations_to_add = []
-
-        for match_json in match_data:
-            match_id = match_json["metadata"]["match_id"]
-
-            if match_id in existing_matches:
-                # Match already in DB — check if player is linked
-                participation = existing_parts.get(match_id)
-
-                if participation and participation.linked_to_match:
-                    k -= 1
-                    if k == 0:
-                        # Commit any pending new data before returning
-                        if new_matches_to_add or new_participations_to_add:
-                            db.add_all(new_matches_to_add)
-                            db.commit()
-                            db.add_all(new_participations_to_add)
-                            db.commit()
-                        return "done"  # Safety cap of 3 we stop here
-                else:
-                    # Link this player to the existing match
-                    if participation:
-                        participation.linked_to_match = True
-                    k = 3
-
+        to_process = []
+        seen = set()
+        for match_id in incoming_ids:
+            if match_id in seen:
+                continue
+            seen.add(match_id)
+            if existing_parts.get(match_id):
+                k -= 1
+                if k == 0:
+                    return to_process, True
             else:
-                new_match = Match(
-                    id=match_id,
-                    map_name=match_json["metadata"]["map"]["name"],
-                    start_time=match_json["metadata"]["started_at"],
-                    start_time_patched=datetime.fromisoformat(match_json["metadata"]["started_at"]),
-                    duration_ms=match_json["metadata"]["game_length_in_ms"],
-                    winning_team=(
-                        "Red" if match_json["teams"][0]["won"] else "Blue"
-                    ),  # "Blue" or "Red"
-                    rounds_play=match_json["teams"][0]["rounds"]["won"]+match_json["teams"][0]["rounds"]["lost"],
-                    blue_team_score=match_json["teams"][1]["rounds"]["won"],
-                    red_team_score=match_json["teams"][0]["rounds"]["won"],
-                )
-                new_matches_to_add.append(new_match)
+                if match_id in existing_parts:
+                    k = 3  # Match already in DB, this player just gets linked
+                to_process.append(match_id)
+        return to_process, False
 
-                all_players_raw = match_json["players"]
+    async def sync_match_ids(
+        self,
+        region: str,
+        puuid: str,
+        match_ids: list[str],
+        db: Session,
+        priority: str = INTERACTIVE,
+        start: int = 0,
+        semaphore: asyncio.Semaphore | None = None,
+    ) -> dict:
+        """
+        Ingest a page of match ids, downloading only matches nobody has stored.
 
-                all_players_sorted = sorted(
-                    all_players_raw, key=lambda x: x["stats"]["score"], reverse=True
-                )
+        Once any player from a lobby has synced, the match and all ten
+        participations are already in the DB, so for everyone else the
+        player's row is simply marked linked. A page whose ids are all known
+        costs no v4 call at all; if any id is unknown, the v4 page at `start`
+        is fetched once and its unknown matches are ingested from it.
+        """
+        result = {"new_matches": 0, "new_participations": 0, "linked": 0, "done": False,
+                  "affected_puuids": set()}
+        semaphore = semaphore or asyncio.Semaphore(settings.MATCH_BACKFILL_CONCURRENCY)
 
-                for rank, players in enumerate(all_players_sorted, start=1):
-                    if new_match.blue_team_score == new_match.red_team_score:
-                        tmpres = "draw"
-                    elif (
-                        new_match.blue_team_score > new_match.red_team_score
-                        and players["team_id"] == "Blue"
-                    ):
-                        tmpres = "win"
-                    elif (
-                        new_match.blue_team_score < new_match.red_team_score
-                        and players["team_id"] == "Red"
-                    ):
-                        tmpres = "win"
-                    else:
-                        tmpres = "lose"
-                        
-                    new_participation = MatchParticipation(
-                        match_id=new_match.id,
-                        rounds_played=new_match.rounds_play,
-                        start_time=new_match.start_time,
-                        map=new_match.map_name,
-                        user_id=players["name"],
-                        user_tag=players["tag"],
-                        puuid=players["puuid"],
-                        agent_name=players["agent"]["name"],
-                        agent_image=small_display_icon[players["agent"]["name"]],
-                        
-                        team_id=players["team_id"],
-                        current_rank=players["tier"]["name"],
-                        current_rank_image=f"/static/rank_png/{players['tier']['name']}.png" if players.get("tier", {}).get("name") else "",
-                        kills=players["stats"]["kills"],
-                        deaths=players["stats"]["deaths"],
-                        assists=players["stats"]["assists"],
-                        combat_score=players["stats"]["score"],
-                        headshots=players["stats"]["headshots"],
-                        othershots=players["stats"]["bodyshots"]
-                        + players["stats"]["legshots"],
-                        damage_dealt=players["stats"]["damage"]["dealt"],
-                        damage_taken=players["stats"]["damage"]["received"],
-                        roundsWon=(
-                            new_match.blue_team_score
-                            if players["team_id"] == "Blue"
-                            else new_match.red_team_score
-                        ),
-                        roundsLost=(
-                            new_match.red_team_score
-                            if players["team_id"] == "Blue"
-                            else new_match.blue_team_score
-                        ),
-                        result=tmpres,
-                        position=rank,
-                        linked_to_match=True if players["puuid"] == puuid else False,
-                    )
-                    new_participations_to_add.append(new_participation)
+        to_process, result["done"] = self._apply_link_cutoff(match_ids, puuid, db)
+        if not to_process:
+            return result
 
-        # ── BATCH COMMIT (all at once instead of per-match) ──────────────────
-        if new_matches_to_add:
-            db.add_all(new_matches_to_add)
-            db.commit()
-        if new_participations_to_add:
-            db.add_all(new_participations_to_add)
+        known_ids = set(db.exec(select(Match.id).where(Match.id.in_(to_process))).all())
+        if known_ids:
+            parts = MatchParticipation.__table__
+            link_stmt = (
+                update(parts)
+                .where(
+                    parts.c.puuid == puuid,
+                    parts.c.match_id.in_(known_ids),
+                    parts.c.linked_to_match.is_(False),
+                )
+                .values(linked_to_match=True)
+            )
+            result["linked"] += db.exec(link_stmt).rowcount
             db.commit()
-            
-    def get_match_detail(self, match_id: str, db : Session):
-        # Query match details with participations
-        statement = select(Match).where(Match.id == match_id)
-        match = db.exec(statement).first()
 
-        if not match:
-            return None
+        unknown_ids = {match_id for match_id in to_process if match_id not in known_ids}
+        if unknown_ids:
+            async with semaphore:
+                page = await self.get_matches_by_region_and_puuid(region, puuid, start, priority)
+            # A match the page lacks (listing and page disagree) is picked up
+            # by the next sync
+            match_data = [m for m in page if m["metadata"]["match_id"] in unknown_ids]
+            ingested = self.fetch_and_update_matches(match_data, puuid, db)
+            for key in ("new_matches", "new_participations", "linked"):
+                result[key] += ingested[key]
+            result["affected_puuids"] |= ingested["affected_puuids"]
 
-        # Query participations by match_id
-        statement = select(MatchParticipation).where(MatchParticipation.match_id == match_id)
-        participants = db.exec(statement).all()
+        return result
 
-        # Set participations on the match object
-        match.participations = participants
+    def fetch_and_update_matches(self, match_data, puuid: str, db: Session) -> dict:
+        """
+        Bulk-ingest one page of v4 match JSON for `puuid`.
+
+        One lookup plus two multi-row INSERT ... ON CONFLICT statements in a
+        single transaction, so concurrent tasks for players from the same
+        lobby never fail on unique_match_participation:
+          - match rows:         ON CONFLICT (id) DO NOTHING
+          - participation rows: ON CONFLICT (match_id, puuid) DO UPDATE that
+            only flips linked_to_match for the requesting player
+        New participations are folded into player_stats in the same
+        transaction. Returns counts of new/linked rows, whether the
+        "already linked" cutoff was reached ("done"), and the players who got
+        new participations ("affected_puuids": their match history changed).
+        """
+        result = {"new_matches": 0, "new_participations": 0, "linked": 0, "done": False,
+                  "affected_puuids": set()}
+
+        # ── ONE LOOKUP: which incoming matches this player already has ──────
+        incoming_ids = [m["metadata"]["match_id"] for m in match_data]
+        ingest_ids, result["done"] = self._apply_link_cutoff(incoming_ids, puuid, db)
+        by_id = {m["metadata"]["match_id"]: m for m in match_data}
+        to_ingest = [by_id[match_id] for match_id in ingest_ids]
 
-        return match
+        if not to_ingest:
+            return result
+
+        match_rows = []
+        participation_rows = []
+        for match_json in to_ingest:
+            match_row = self._build_match_row(match_json)
+            match_rows.append(match_row)
+            participation_rows.extend(
+                self._build_participation_rows(match_row, match_json, puuid)
+            )
+
+        # ── BULK UPSERT (multi-row VALUES, idempotent under concurrency) ─────
+        match_stmt = (
+            insert(Match.__table__)
+            .values(match_rows)
+            .on_conflict_do_nothing(index_elements=["id"])
+            .returning(Match.__table__.c.id)
+        )
+        result["new_matches"] = len(db.exec(match_stmt).all())
+
+        parts = MatchParticipation.__table__
+        part_stmt = insert(parts).values(participation_rows)
+        part_stmt = part_stmt.on_conflict_do_update(
+            constraint="unique_match_participation",
+            set_={"linked_to_match": True},
+            where=part_stmt.excluded.linked_to_match & parts.c.linked_to_match.is_(False),
+        ).returning(
+            parts.c.match_id,
+            parts.c.puuid,
+            # xmax = 0 only for freshly inserted rows, not for updated ones
+            literal_column("(xmax = 0)").label("inserted"),
+        )
+        inserted_keys = set()
+        for match_id, part_puuid, inserted in db.exec(part_stmt).all():
+            if inserted:
+                inserted_keys.add((match_id, part_puuid))
+            else:
+                result["linked"] += 1
+        result["new_participations"] = len(inserted_keys)
+        result["affected_puuids"] = {part_puuid for _, part_puuid in inserted_keys}
+
+        # Fold the new rows into every affected player's rolling stats
+        update_player_stats(
+            [r for r in participation_rows if (r["match_id"], r["puuid"]) in inserted_keys],
+            db,
+        )
+
+        db.commit()
+        return result
+            
+    async def get_match_detail(self, match_id: str, db: AsyncSession):
+        # Match and its participations in one joined query (stable player order)
+        statement = (
+            select(Match)
+            .outerjoin(Match.participations)
+            .options(contains_eager(Match.participations))
+            .where(Match.id == match_id)
+            .order_by(MatchParticipation.id)
+        )
+        return (await db.exec(statement)).unique().first()
 
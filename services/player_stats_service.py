@@ -0,0 +1,278 @@
+"""
+Player Stats Service - rolling aggregates maintained on ingest.
+
+Every participation inserted by MatchService.fetch_and_update_matches is
+folded into its player's `player_stats` row in the same transaction:
+running sums (and sums of squares for stdev) plus per-map and per-agent
+counters over the last PLAYER_STATS_WINDOW matches. Reading a player's
+stats is then one primary-key lookup instead of a scan of match rows.
+"""
+
+import copy
+import math
+from datetime import datetime, timezone
+from sqlalchemy import desc, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from core.config import settings
+from models.match import MatchParticipation
+from models.player_stats import PlayerStats
+
+_SUM_FIELDS = ("kd", "acs", "adr", "hs", "dpr", "position")
+
+
+def _timestamp(value) -> str:
+    """Normalize API strings and DB datetimes to one sortable ISO format (UTC)."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+
+def match_entry(row) -> dict:
+    """Per-match values of one participation (a row dict or a DB row mapping)."""
+    rounds = max(row["rounds_played"], 1)
+    return {
+        "match_id": row["match_id"],
+        "start_time": _timestamp(row["start_time"]),
+        "map": row["map"],
+        "agent": row["agent_name"],
+        "kd": row["kills"] / max(row["deaths"], 1),
+        "acs": row["combat_score"] / rounds,
+        "adr": row["damage_dealt"] / rounds,
+        "hs": row["headshots"] / max(row["headshots"] + row["othershots"], 1) * 100,
+        "dpr": row["deaths"] / rounds,
+        "win": row["result"] == "win",
+        "position": row["position"],
+    }
+
+
+def _empty_stats(puuid: str) -> dict:
+    stats = {
+        "puuid": puuid,
+        "window_size": settings.PLAYER_STATS_WINDOW,
+        "matches": 0,
+        "wins": 0,
+        "top2": 0,
+        "bottom2": 0,
+        "mvps": 0,
+        "maps": {},
+        "agents": {},
+        "recent": [],
+    }
+    for field in _SUM_FIELDS:
+        stats[f"sum_{field}"] = 0.0
+    stats["sum_kd_sq"] = 0.0
+    stats["sum_acs_sq"] = 0.0
+    return stats
+
+
+def _apply(stats: dict, entry: dict, sign: int):
+    """Add (sign=1) or remove (sign=-1) one match's contribution."""
+    stats["matches"] += sign
+    for field in _SUM_FIELDS:
+        stats[f"sum_{field}"] += sign * entry[field]
+    stats["sum_kd_sq"] += sign * entry["kd"] ** 2
+    stats["sum_acs_sq"] += sign * entry["acs"] ** 2
+    stats["wins"] += sign * entry["win"]
+    stats["top2"] += sign * (entry["position"] <= 2)
+    stats["bottom2"] += sign * (entry["position"] >= 9)
+    stats["mvps"] += sign * (entry["position"] == 1)
+
+    for key, name in (("maps", entry["map"]), ("agents", entry["agent"])):
+        bucket = stats[key].setdefault(name, {"games": 0, "wins": 0, "sum_kd": 0.0, "sum_acs": 0.0})
+        bucket["games"] += sign
+        bucket["wins"] += sign * entry["win"]
+        bucket["sum_kd"] += sign * entry["kd"]
+        bucket["sum_acs"] += sign * entry["acs"]
+        if bucket["games"] <= 0:
+            del stats[key][name]
+
+
+def _merge(stats: dict, new_entries: list[dict]) -> dict:
+    """Slide the window: add new matches, evict whatever falls off the end."""
+    window = stats["window_size"]
+    known = {e["match_id"] for e in stats["recent"]}
+    new_entries = [e for e in new_entries if e["match_id"] not in known]
+
+    combined = sorted(stats["recent"] + new_entries, key=lambda e: e["start_time"], reverse=True)
+    kept, dropped = combined[:window], combined[window:]
+    kept_ids = {e["match_id"] for e in kept}
+
+    for entry in new_entries:
+        if entry["match_id"] in kept_ids:
+            _apply(stats, entry, 1)
+    for entry in dropped:
+        if entry["match_id"] in known:
+            _apply(stats, entry, -1)
+
+    stats["recent"] = kept
+    return stats
+
+
+def _rebuild(puuids: list[str], db: Session) -> dict[str, dict]:
+    """Recompute stats from match rows — one windowed query for all puuids."""
+    if not puuids:
+        return {}
+    window = settings.PLAYER_STATS_WINDOW
+    mp = MatchParticipation.__table__
+    ranked = (
+        select(
+            mp.c.match_id, mp.c.puuid, mp.c.start_time, mp.c.map, mp.c.agent_name,
+            mp.c.kills, mp.c.deaths, mp.c.combat_score, mp.c.damage_dealt,
+            mp.c.rounds_played, mp.c.headshots, mp.c.othershots, mp.c.result,
+            mp.c.position,
+            func.row_number().over(
+                partition_by=mp.c.puuid, order_by=desc(mp.c.start_time)
+            ).label("rn"),
+        )
+        .where(mp.c.puuid.in_(puuids))
+        .subquery()
+    )
+    statement = select(*ranked.c).where(ranked.c.rn <= window).order_by(ranked.c.puuid, ranked.c.rn)
+
+    rebuilt = {puuid: _empty_stats(puuid) for puuid in puuids}
+    for row in db.exec(statement).mappings():
+        stats = rebuilt[row["puuid"]]
+        entry = match_entry(row)
+        _apply(stats, entry, 1)
+        stats["recent"].append(entry)
+    return rebuilt
+
+
+def update_player_stats(new_rows: list[dict], db: Session):
+    """
+    Fold freshly inserted participation rows into their players' stats.
+    Runs inside the ingestion transaction; the caller commits.
+    """
+    if not new_rows:
+        return
+
+    new_entries = {}
+    for row in new_rows:
+        new_entries.setdefault(row["puuid"], []).append(match_entry(row))
+    # Sorted, so concurrent ingestions take the row locks in the same order
+    puuids = sorted(new_entries)
+    now = datetime.now(timezone.utc)
+    table = PlayerStats.__table__
+
+    # Make sure every player has a row to lock. A concurrent ingestion that
+    # already created one blocks us here until it commits; the rows we
+    # create ourselves are rebuilt below, everyone else's are merged into.
+    placeholders = insert(table).values(
+        [{**_empty_stats(puuid), "updated_at": now} for puuid in puuids]
+    ).on_conflict_do_nothing(index_elements=["puuid"]).returning(table.c.puuid)
+    created = {row.puuid for row in db.exec(placeholders)}
+
+    locked = db.exec(
+        select(PlayerStats).where(PlayerStats.puuid.in_(puuids)).with_for_update()
+    ).all()
+    current = {
+        s.puuid: copy.deepcopy(s.model_dump())
+        for s in locked
+        if s.puuid not in created and s.window_size == settings.PLAYER_STATS_WINDOW
+    }
+
+    # Players seen for the first time (or after a window change) are rebuilt
+    # from their match rows, which already include this transaction's inserts.
+    updated = _rebuild([p for p in puuids if p not in current], db)
+    for puuid, stats in current.items():
+        updated[puuid] = _merge(stats, new_entries[puuid])
+
+    values = [{**stats, "updated_at": now} for stats in updated.values()]
+    stmt = insert(table).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["puuid"],
+        set_={c.name: stmt.excluded[c.name] for c in table.c if c.name != "puuid"},
+    )
+    db.exec(stmt)
+
+
+async def get_player_stats(puuid: str, db: AsyncSession) -> PlayerStats | None:
+    """O(1) read of a player's rolling stats."""
+    return await db.get(PlayerStats, puuid)
+
+
+def _stdev(total: float, total_sq: float, n: int) -> float:
+    return math.sqrt(max(total_sq - total * total / n, 0) / (n - 1))
+
+
+def summarize(stats: PlayerStats) -> dict:
+    """
+    Turn a stats row into the same dicts the ai_service analysis functions
+    produce (summary, maps, agents, consistency, impact, trend).
+    """
+    n = stats.matches
+    if n == 0:
+        return {"summary": {}, "maps": [], "agents": [], "consistency": {"kd_std": 0, "acs_std": 0},
+                "impact": {}, "trend": {"kd_trend": 0, "acs_trend": 0, "direction": "not_enough_data"}}
+
+    summary = {
+        "avg_kd": round(stats.sum_kd / n, 2),
+        "avg_adr": round(stats.sum_adr / n),
+        "avg_acs": round(stats.sum_acs / n),
+        "avg_hs": round(stats.sum_hs / n),
+        "deaths_per_round": round(stats.sum_dpr / n, 2),
+        "win_rate": round(stats.wins / n, 2),
+        "total_matches": n,
+    }
+
+    # Keep the most-recently-played-first ordering of the row-scanning path
+    map_order = list(dict.fromkeys(e["map"] for e in stats.recent))
+    agent_order = list(dict.fromkeys(e["agent"] for e in stats.recent))
+
+    def group_stats(buckets: dict, order: list[str], label: str, min_games: int) -> list[dict]:
+        grouped = []
+        for name in order:
+            b = buckets.get(name)
+            if not b or b["games"] < min_games:
+                continue
+            grouped.append({
+                label: name,
+                "games": b["games"],
+                "win_rate": round(b["wins"] / b["games"], 2),
+                "avg_kd": round(b["sum_kd"] / b["games"], 2),
+                "avg_acs": round(b["sum_acs"] / b["games"]),
+            })
+        return grouped
+
+    if n < 3:
+        consistency = {"kd_std": 0, "acs_std": 0}
+    else:
+        consistency = {
+            "kd_std": round(_stdev(stats.sum_kd, stats.sum_kd_sq, n), 2),
+            "acs_std": round(_stdev(stats.sum_acs, stats.sum_acs_sq, n), 2),
+        }
+
+    impact = {
+        "avg_position": round(stats.sum_position / n, 1),
+        "top2_rate": round(stats.top2 / n, 2),
+        "bottom2_rate": round(stats.bottom2 / n, 2),
+        "mvp_count": stats.mvps,
+    }
+
+    window = settings.TREND_RECENT_MATCHES
+    if n < window + 1:
+        trend = {"kd_trend": 0, "acs_trend": 0, "direction": "not_enough_data"}
+    else:
+        recent, older = stats.recent[:window], stats.recent[window:]
+        kd_diff = round(
+            sum(e["kd"] for e in recent) / len(recent) - sum(e["kd"] for e in older) / len(older), 2
+        )
+        acs_diff = sum(e["acs"] for e in recent) / len(recent) - sum(e["acs"] for e in older) / len(older)
+        trend = {
+            "kd_trend": kd_diff,
+            "acs_trend": round(acs_diff),
+            "direction": "improving" if kd_diff > 0.1 else "slumping" if kd_diff < -0.1 else "stable",
+        }
+
+    return {
+        "summary": summary,
+        "maps": group_stats(stats.maps, map_order, "map", 3),
+        "agents": group_stats(stats.agents, agent_order, "agent", 2),
+        "consistency": consistency,
+        "impact": impact,
+        "trend": trend,
+    }
@@ -0,0 +1,70 @@
+"""
+Report Cache - replays finished coaching reports instead of regenerating them.
+
+A report only changes when the player's newest match or their weakness set
+changes, so that pair (plus the analysis window) is hashed into a
+fingerprint stored next to the report text. Lookups go through an
+in-process LRU first, then a Redis hash per player (`ai_report:{puuid}`,
+one field per window). fetch_matches_task deletes the hash when it
+ingests new games; a stale fingerprint is treated as a miss either way.
+"""
+import hashlib
+import json
+from redis.exceptions import RedisError
+from core.config import settings
+from core.lru import LRUCache
+from core.redis import get_async_redis
+
+_local = LRUCache(maxsize=settings.REPORT_CACHE_LRU_SIZE, ttl=settings.REPORT_CACHE_TTL)
+
+
+def report_cache_key(puuid: str) -> str:
+    return f"ai_report:{puuid}"
+
+
+def report_fingerprint(latest_match_id: str | None, weaknesses: list[dict], window_key: str) -> str:
+    weakness_set = sorted(
+        f"{w['type']}|{w.get('agent', '')}|{w.get('map', '')}" for w in weaknesses
+    )
+    payload = json.dumps([latest_match_id, window_key, weakness_set])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+async def get_cached_report(puuid: str, window_key: str, fingerprint: str) -> str | None:
+    entry = _local.get((puuid, window_key))
+    if entry is None:
+        try:
+            raw = await get_async_redis(decode_responses=True).hget(report_cache_key(puuid), window_key)
+        except RedisError as e:
+            print(f"[ReportCache] Redis read failed: {e}")
+            return None
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        _local.set((puuid, window_key), entry)
+
+    if entry["fingerprint"] != fingerprint:
+        return None
+    return entry["text"]
+
+
+async def store_report(puuid: str, window_key: str, fingerprint: str, text: str):
+    """Called by the report stream once generation completes."""
+    entry = {"fingerprint": fingerprint, "text": text}
+    _local.set((puuid, window_key), entry)
+
+    try:
+        key = report_cache_key(puuid)
+        pipe = get_async_redis(decode_responses=True).pipeline()
+        pipe.hset(key, window_key, json.dumps(entry))
+        pipe.expire(key, settings.REPORT_CACHE_TTL)
+        await pipe.execute()
+    except RedisError as e:
+        print(f"[ReportCache] Redis write failed: {e}")
+
+
+async def replay_report(text: str):
+    """Stream a cached report back in chunks, like a live generation."""
+    size = settings.REPORT_CACHE_CHUNK_SIZE
+    for i in range(0, len(text), size):
+        yield text[i : i + size]
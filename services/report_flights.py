@@ -0,0 +1,135 @@
+"""
+Report Flights - one generation per report, however many people are watching.
+
+Concurrent requests for the same report key (player + window + fingerprint)
+join a single in-flight generation: the first request starts it as a
+background task, every subscriber gets the chunks produced so far replayed
+and then follows the live stream. The generation is cancelled only when its
+last subscriber disconnects.
+
+Generations also wait for a slot in a process-wide limiter
+(REPORT_MAX_CONCURRENT_GENERATIONS). While a flight is queued its
+subscribers receive `("queue", {"position": n})` events.
+"""
+import asyncio
+import json
+from core.config import settings
+
+
+class GenerationLimiter:
+    """FIFO semaphore that reports each waiter's queue position."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiting = []
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, on_position):
+        async with self._cond:
+            if self.active < self.limit and not self._waiting:
+                self.active += 1
+                return
+            ticket = object()
+            self._waiting.append(ticket)
+            try:
+                while not (self._waiting[0] is ticket and self.active < self.limit):
+                    on_position(self._waiting.index(ticket) + 1)
+                    await self._cond.wait()
+                self._waiting.pop(0)
+                self.active += 1
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                self._cond.notify_all()
+                raise
+            finally:
+                on_position(None)
+            # Someone behind us may have moved up a place
+            self._cond.notify_all()
+
+    async def release(self):
+        async with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+
+class Flight:
+    def __init__(self, key, make_chunks):
+        self.key = key
+        self.chunks = []
+        self.position = None
+        self.done = False
+        self.subscribers = 0
+        self._make_chunks = make_chunks
+        self._changed = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _set_position(self, position: int | None):
+        if position != self.position:
+            self.position = position
+            self._notify()
+
+    async def _run(self):
+        try:
+            await _limiter.acquire(self._set_position)
+            try:
+                async for chunk in self._make_chunks():
+                    self.chunks.append(chunk)
+                    self._notify()
+            finally:
+                await _limiter.release()
+        finally:
+            self.done = True
+            if _flights.get(self.key) is self:
+                del _flights[self.key]
+            self._notify()
+
+    async def subscribe(self):
+        self.subscribers += 1
+        sent, position = 0, None
+        try:
+            while True:
+                changed = self._changed
+                if self.position != position:
+                    position = self.position
+                    if position is not None:
+                        yield ("queue", json.dumps({"position": position}))
+                while sent < len(self.chunks):
+                    yield self.chunks[sent]
+                    sent += 1
+                if self.done:
+                    return
+                await changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                # Nobody is listening: stop generating, and let the next
+                # request start a fresh flight instead of joining this one
+                if _flights.get(self.key) is self:
+                    del _flights[self.key]
+                self._task.cancel()
+
+
+_flights: dict = {}
+_limiter = GenerationLimiter(settings.REPORT_MAX_CONCURRENT_GENERATIONS)
+
+
+def join_report(key, make_chunks):
+    """
+    Subscribe to the generation for `key`, starting it with `make_chunks()`
+    (an async generator factory) if none is in flight.
+    """
+    flight = _flights.get(key)
+    if flight is None:
+        flight = Flight(key, make_chunks)
+        _flights[key] = flight
+        flight.start()
+    return flight.subscribe()
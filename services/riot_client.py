@@ -1,6 +1,7 @@
-import httpx
 from urllib.parse import quote
 from core.config import settings
+from core.http_client import get_http_client
+from core.rate_governor import upstream_governor, INTERACTIVE
 from fastapi import HTTPException
 
 
@@ -15,14 +16,16 @@ class RiotClient:
         # URL cua Henrikdev
         url = self.base_url + f"/v1/account/{quote(player_name)}/{quote(player_tag)}?force=true"
 
-        async with httpx.AsyncClient(timeout=httpx.Timeout(10.0)) as client:
-            response = await client.get(url, headers=self.headers)
-            if response.status_code == 200:
-                data = response.json()
-                return data["data"]["puuid"], data["data"]["region"]
-            error_msg = f"HenrikAPI Error: {response.status_code} - {response.text}"
-            print(error_msg)  # In ra terminal (phòng hờ)
-            raise HTTPException(status_code=response.status_code, detail=error_msg)
+        await upstream_governor.acquire(INTERACTIVE)
+        response = await get_http_client().get(url, headers=self.headers)
+        if response.status_code == 200:
+            data = response.json()
+            return data["data"]["puuid"], data["data"]["region"]
+        if response.status_code == 429:
+            await upstream_governor.drain()
+        error_msg = f"HenrikAPI Error: {response.status_code} - {response.text}"
+        print(error_msg)  # In ra terminal (phòng hờ)
+        raise HTTPException(status_code=response.status_code, detail=error_msg)
 
     
 
@@ -0,0 +1,244 @@
+"""
+Vector Index - in-process nearest-neighbour search over coaching tips.
+
+The knowledge base is a few hundred tips, so the whole corpus fits in one
+normalized float32 matrix. A search is then one matrix-vector product plus
+boolean masks for the agent/map filters, with no Postgres round-trip.
+
+- Built from the `coachingtip` table and snapshotted to
+  settings.VECTOR_INDEX_DIR (embeddings.npy, memory-mapped on the next boot,
+  plus meta.json).
+- Versioned by a Redis counter that the seed scripts bump (bump_version).
+  Each process re-checks it at most every VECTOR_INDEX_REFRESH_SECONDS and
+  rebuilds when it has moved.
+- Above VECTOR_INDEX_MAX_TIPS rows get_index returns None and callers fall
+  back to pgvector.
+- aget_index is the event-loop variant: the version check uses async Redis
+  and only an actual rebuild (first use, re-seeded tips) leaves the loop.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+import numpy as np
+from redis.exceptions import RedisError
+from sqlalchemy import func
+from sqlmodel import Session, select
+from core.config import settings
+from core.database import engine
+from core.redis import get_async_redis, get_redis
+from models.coaching_tip import CoachingTip
+
+VERSION_KEY = "knowledge_base:version"
+
+_index = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+class VectorIndex:
+    def __init__(self, vectors: np.ndarray, meta: dict):
+        self.vectors = vectors
+        self.version = meta["version"]
+        self.content = meta["content"]
+        self.category = meta["category"]
+        self.agent = np.array(meta["agent"])
+        self.map_name = np.array(meta["map"])
+
+    def __len__(self):
+        return len(self.content)
+
+    # ─── Building & snapshots ─────────────────────────────────────────────
+
+    @classmethod
+    def from_db(cls, db: Session, version: str | None) -> "VectorIndex":
+        rows = db.exec(
+            select(CoachingTip.content, CoachingTip.agent, CoachingTip.map_name,
+                   CoachingTip.category, CoachingTip.embedding)
+            .where(CoachingTip.embedding.is_not(None))
+            .order_by(CoachingTip.id)
+        ).all()
+        vectors = np.array([r.embedding for r in rows], dtype=np.float32).reshape(len(rows), settings.EMBEDDING_DIM)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+        meta = {
+            "version": version,
+            "content": [r.content for r in rows],
+            "agent": [r.agent for r in rows],
+            "map": [r.map_name for r in rows],
+            "category": [r.category for r in rows],
+        }
+        return cls(vectors, meta)
+
+    @classmethod
+    def load(cls, directory: str) -> "VectorIndex | None":
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+            vectors = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if len(vectors) != len(meta["content"]):
+            return None
+        return cls(vectors, meta)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        # Write-then-rename so a concurrent boot never maps a half-written file
+        tmp = os.path.join(directory, f"embeddings.{os.getpid()}.npy")
+        np.save(tmp, np.asarray(self.vectors))
+        os.replace(tmp, os.path.join(directory, "embeddings.npy"))
+        meta = {
+            "version": self.version,
+            "content": self.content,
+            "agent": self.agent.tolist(),
+            "map": self.map_name.tolist(),
+            "category": self.category,
+        }
+        tmp = os.path.join(directory, f"meta.{os.getpid()}.json")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(directory, "meta.json"))
+
+    # ─── Search ───────────────────────────────────────────────────────────
+
+    def _mask(self, agent_filter: str | None, map_filter: str | None) -> np.ndarray:
+        mask = np.ones(len(self), dtype=bool)
+        if agent_filter:
+            mask &= (self.agent == agent_filter) | (self.agent == "all")
+        if map_filter:
+            mask &= (self.map_name == map_filter) | (self.map_name == "all")
+        return mask
+
+    def _result(self, i: int, score: float) -> dict:
+        return {
+            "content": self.content[i],
+            "agent": str(self.agent[i]),
+            "map": str(self.map_name[i]),
+            "category": self.category[i],
+            "score": round(float(score), 4),
+        }
+
+    def _ranked(self, scores: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """Candidate positions, best first."""
+        candidates = np.flatnonzero(mask)
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    def search(self, query_vec, top_k: int = 3, agent_filter: str | None = None,
+               map_filter: str | None = None) -> list[dict]:
+        scores = self.vectors @ np.asarray(query_vec, dtype=np.float32)
+        best = self._ranked(scores, self._mask(agent_filter, map_filter))[:top_k]
+        return [self._result(i, scores[i]) for i in best]
+
+    def search_batch(self, searches: list[dict], query_vecs, top_k: int = 3) -> list[list[dict]]:
+        """
+        Same contract as knowledge_base.search_knowledge_batch: top_k per
+        search, and a tip already returned for an earlier search is dropped.
+        """
+        scores = np.asarray(query_vecs, dtype=np.float32) @ self.vectors.T
+        seen = set()
+        grouped = []
+        for s, row in zip(searches, scores):
+            best = self._ranked(row, self._mask(s.get("agent"), s.get("map")))[:top_k]
+            results = []
+            for i in best:
+                if self.content[i] not in seen:
+                    seen.add(self.content[i])
+                    results.append(self._result(i, row[i]))
+            grouped.append(results)
+        return grouped
+
+
+# ─── Versioning ───────────────────────────────────────────────────────────────
+
+def _current_version() -> str | None:
+    try:
+        return get_redis(decode_responses=True).get(VERSION_KEY)
+    except RedisError as e:
+        print(f"[VectorIndex] Could not read knowledge version: {e}")
+        return None
+
+
+def bump_version():
+    """Called after the coachingtip table changes; every process rebuilds."""
+    try:
+        get_redis(decode_responses=True).incr(VERSION_KEY)
+    except RedisError as e:
+        print(f"[VectorIndex] Could not bump knowledge version: {e}")
+
+
+# ─── Process-wide index ───────────────────────────────────────────────────────
+
+def _build(db: Session, version: str | None) -> VectorIndex | None:
+    count = db.exec(
+        select(func.count()).select_from(CoachingTip).where(CoachingTip.embedding.is_not(None))
+    ).one()
+    if count > settings.VECTOR_INDEX_MAX_TIPS:
+        print(f"[VectorIndex] {count} tips is above the in-process limit; using pgvector.")
+        return None
+
+    # Same version as the snapshot on disk: map it instead of reading rows
+    if version is not None:
+        snapshot = VectorIndex.load(settings.VECTOR_INDEX_DIR)
+        if snapshot is not None and snapshot.version == version and len(snapshot) == count:
+            return snapshot
+
+    index = VectorIndex.from_db(db, version)
+    try:
+        index.save(settings.VECTOR_INDEX_DIR)
+    except OSError as e:
+        print(f"[VectorIndex] Could not write snapshot: {e}")
+    print(f"[VectorIndex] Built index over {len(index)} tips (version {version}).")
+    return index
+
+
+def _is_current(version: str | None) -> bool:
+    # Redis unreachable (version None): keep serving what we have
+    return _index is not None and (version is None or _index.version == version)
+
+
+def _refresh(db: Session, version: str | None) -> VectorIndex | None:
+    global _index, _checked_at
+    with _lock:
+        if not _is_current(version):
+            _index = _build(db, version)
+        _checked_at = time.monotonic()
+    return _index
+
+
+def get_index(db: Session) -> VectorIndex | None:
+    """
+    The current in-process index, rebuilt if the knowledge version moved.
+    None means search in Postgres instead.
+    """
+    if time.monotonic() - _checked_at < settings.VECTOR_INDEX_REFRESH_SECONDS:
+        return _index
+    return _refresh(db, _current_version())
+
+
+def _refresh_with_session(version: str | None) -> VectorIndex | None:
+    with Session(engine) as db:
+        return _refresh(db, version)
+
+
+async def aget_index() -> VectorIndex | None:
+    """get_index for async callers (no session needed; see module docstring)."""
+    global _checked_at
+    if time.monotonic() - _checked_at < settings.VECTOR_INDEX_REFRESH_SECONDS:
+        return _index
+    try:
+        version = await get_async_redis(decode_responses=True).get(VERSION_KEY)
+    except RedisError as e:
+        print(f"[VectorIndex] Could not read knowledge version: {e}")
+        version = None
+    if _is_current(version):
+        _checked_at = time.monotonic()
+        return _index
+    return await asyncio.to_thread(_refresh_with_session, version)
+
+
+def warm():
+    """Build (or map) the index at startup so the first report doesn't pay for it."""
+    _refresh_with_session(_current_version())
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlmodel import Session, SQLModel, create_engine
+
+from models.match import Match, MatchParticipation
+from models.player_stats import PlayerStats
+from services.player_stats_service import update_player_stats
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_as_json(type_, compiler, **kw):
+    return "JSON"
+
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(
+        engine, tables=[Match.__table__, MatchParticipation.__table__, PlayerStats.__table__]
+    )
+    with Session(engine) as session:
+        yield session
+
+
+def ingest(db: Session, match_no: int, puuids: list[str], kills: int = 10) -> list[dict]:
+    """Insert one match the way fetch_and_update_matches does and fold it into the stats."""
+    match_id = f"match-{match_no}"
+    start_time = START + timedelta(hours=match_no)
+    db.add(Match(
+        id=match_id, map_name="Bind", start_time=start_time, start_time_patched="",
+        duration_ms=1, winning_team="Blue", rounds_play=20, blue_team_score=13, red_team_score=7,
+    ))
+    rows = []
+    for position, puuid in enumerate(puuids, start=1):
+        row = dict(
+            match_id=match_id, rounds_played=20, start_time=start_time, map="Bind",
+            user_id=puuid, user_tag="0000", puuid=puuid, agent_name="Jett", agent_image="",
+            team_id="Blue", current_rank="", current_rank_image="", kills=kills, deaths=5,
+            assists=2, combat_score=4000, headshots=10, othershots=30, damage_dealt=3000,
+            damage_taken=2000, roundsWon=13, roundsLost=7, result="win", position=position,
+        )
+        db.add(MatchParticipation(**row))
+        rows.append(row)
+    db.flush()
+    update_player_stats(rows, db)
+    db.commit()
+    return rows
+
+
+def test_first_ingest_rebuilds_from_match_rows(db):
+    ingest(db, 1, ["alice", "bob"])
+
+    alice = db.get(PlayerStats, "alice")
+    assert alice.matches == 1
+    assert alice.wins == 1
+    assert alice.mvps == 1
+    assert alice.sum_kd == pytest.approx(2.0)
+    assert [e["match_id"] for e in alice.recent] == ["match-1"]
+    assert db.get(PlayerStats, "bob").mvps == 0
+
+
+def test_later_ingests_merge_into_existing_rows(db):
+    ingest(db, 1, ["alice"], kills=10)
+    ingest(db, 2, ["alice", "bob"], kills=20)
+
+    alice = db.get(PlayerStats, "alice")
+    db.refresh(alice)
+    assert alice.matches == 2
+    assert alice.sum_kd == pytest.approx(6.0)
+    assert [e["match_id"] for e in alice.recent] == ["match-2", "match-1"]
+    assert db.get(PlayerStats, "bob").matches == 1
+
+
+def test_empty_ingest_is_a_no_op(db):
+    update_player_stats([], db)
+    assert db.get(PlayerStats, "alice") is None
@@ -18,49 +18,83 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    # Same pool size and idle health checks as core.redis for Celery's own
+    # broker/result connections
+    broker_pool_limit=settings.REDIS_MAX_CONNECTIONS,
+    broker_transport_options={"health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL},
+    redis_max_connections=settings.REDIS_MAX_CONNECTIONS,
+    redis_backend_health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
 )
 
 import asyncio
-from services.match_service import MatchService
+from celery.signals import worker_process_shutdown
+from core.http_client import close_http_client
+from core.redis import get_redis, close_redis
+from services.match_service import MatchService, PAGE_SIZE
+from services.match_history import write_histories
+from services.report_cache import report_cache_key
+
+# One event loop per worker process. The pooled HTTP client is bound to the
+# loop it was created on, so reusing the loop across tasks is what lets every
+# task reuse the same warm upstream connections (asyncio.run would not).
+_loop = None
+
+
+def run_async(coro):
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(coro)
+
+
+@worker_process_shutdown.connect
+def _close_worker_loop(**kwargs):
+    if _loop is not None and not _loop.is_closed():
+        _loop.run_until_complete(close_http_client())
+        _loop.run_until_complete(close_redis())
+        _loop.close()
+
 
 @celery_app.task(bind=True)
-def fetch_matches_task(self, puuid: str, region: str):
+def fetch_matches_task(self, puuid: str, region: str, pages: int | None = None):
     """
     Background task to fetch matches from Riot API and store them.
+
+    Backfills `pages` pages of 10 matches (MATCH_BACKFILL_PAGES by default),
+    requested concurrently and ingested until the already-linked cutoff.
     """
-    self.update_state(state="PROGRESS", meta={"status": "Fetching from Riot API...", "current": 0, "total": 20})
+    pages = pages or settings.MATCH_BACKFILL_PAGES
+    total = pages * PAGE_SIZE
+    self.update_state(state="PROGRESS", meta={"status": "Fetching from Riot API...", "current": 0, "total": total})
     
     match_service = MatchService()
     
-    # We will fetch 20 matches.
-    batch = 20
-    start = 0
-    
     # Async call to external API needs to be run in event loop
     try:
-        match_data = asyncio.run(match_service.get_matches_by_region_and_puuid(region, puuid, start))
-        
-        if not match_data:
-            return {"status": "Complete", "message": "No matches found."}
-            
-        self.update_state(state="PROGRESS", meta={"status": "Processing and saving matches to database...", "current": 10, "total": 20})
-        
-        # Save to DB
         with Session(engine) as db:
-            match_service.fetch_and_update_matches(match_data, puuid, db)
+            result = run_async(match_service.backfill_matches(region, puuid, db, pages=pages))
+
+        if not result["matches"]:
+            return {"status": "Complete", "message": "No matches found."}
+
+        self.update_state(state="PROGRESS", meta={"status": "Refreshing cache...", "current": result["matches"], "total": total})
             
-        # Clean up the Redis cache for this user so they get fresh data next time
-        import redis
-        import ssl
-        _redis_url = settings.REDIS_URL.replace("?ssl_cert_reqs=CERT_NONE", "")
-        if "rediss://" in _redis_url:
-            r = redis.Redis.from_url(_redis_url, ssl_cert_reqs=ssl.CERT_NONE)
-        else:
-            r = redis.Redis.from_url(_redis_url)
-        r.delete(f"player_matches_{puuid}")
+        # Drop this user's AI report; it is regenerated from the new matches
+        r = get_redis()
+        r.delete(report_cache_key(puuid))
+        # Write-through: everyone who got new matches (the whole lobby, not
+        # just this user) gets a fresh cached history in one round-trip
+        affected = result["affected_puuids"]
+        if affected:
+            with Session(engine) as db:
+                refreshed = write_histories(affected, db, r)
+            print(f"[Worker] Refreshed match history for {refreshed} players")
             
     except Exception as e:
         self.update_state(state="FAILURE", meta={"error": str(e)})
         raise e
         
-    return {"status": "Complete", "message": f"Successfully fetched matches."}
+    return {
+        "status": "Complete",
+        "message": f"Successfully fetched {result['matches']} matches ({result['new_matches']} new).",
+    }